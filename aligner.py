@@ -0,0 +1,250 @@
+from collections import defaultdict
+
+from quran_index import RestartIndex
+from similarity import id_similarity, score_ids
+
+
+class StreamingAligner:
+    """Incremental alignment of recognizer output against the Quran text.
+
+    Keeps a (surah, ayah, word) cursor and only scores words as they arrive,
+    so the work per audio block does not grow with how much has been recited.
+    Finalized words are fed through accept_final(); the current partial
+    hypothesis is laid over the ayahs after the cursor by align_partial().
+    Words are compared as the corpus vocabulary's integer IDs.
+    """
+
+    def __init__(self, corpus, surah, ayah=1, accuracy_threshold=67, completion_accuracy=50,
+                 restart_index=None, jump_candidates=3, skip_words=0):
+        self.corpus = corpus
+        self.vocab = corpus.vocab
+        # Building the index walks the whole corpus, so share one across sessions
+        self.restart_index = restart_index or RestartIndex(corpus)
+        self.jump_candidates = jump_candidates
+        self.accuracy_threshold = accuracy_threshold
+        self.completion_accuracy = completion_accuracy
+        self.start(surah, ayah, skip_words)
+
+    def start(self, surah, ayah=1, skip_words=0):
+        """Move the cursor to the beginning of an ayah and forget any attempt.
+
+        skip_words finalized words are ignored first, e.g. the rest of an ayah
+        the reciter was already in the middle of when tracking started.
+        """
+        self.surah = int(surah)
+        self.ayah = int(ayah)
+        self.skip_words = skip_words
+        self.finished = False
+        self._reset_attempt()
+        self._reset_window()
+        self._reset_partial()
+
+    @property
+    def word(self):
+        """Index of the next expected word inside the current ayah"""
+        return len(self.words)
+
+    def _reset_attempt(self):
+        # Finalized words recited so far against the ayah at the cursor
+        self.words = []
+        self.ids = []
+        self.scores = []
+        self._attempt = None  # WordSeq of the words, built when first needed
+
+    def _reset_partial(self):
+        # Scores of the last partial's words, valid while the cursor and the
+        # finalized attempt stay where they were when they were computed
+        self.partial_key = None
+        self.partial_ids = []
+        self.partial_scores = []
+
+    def _reset_window(self):
+        # Every finalized word since the last ayah boundary, including failed
+        # attempts, so a restart at an earlier ayah is still recognised
+        self.window_ids = []
+        self.window_votes = defaultdict(int)  # Earlier ayah -> window words it shares
+
+    def _extend_window(self, word_id):
+        skeleton = self.vocab.skeletons[word_id]
+        for ayah_num in self.restart_index.lookup(self.surah, len(self.window_ids), skeleton):
+            self.window_votes[ayah_num] += 1
+        self.window_ids.append(word_id)
+
+    def _attempt_seq(self):
+        # Kept until the attempt changes, as align_partial needs it on every tick
+        if self._attempt is None:
+            self._attempt = self.vocab.seq(self.words, self.ids)
+        return self._attempt
+
+    def accept_final(self, words):
+        """Consume newly finalized words (a WordSeq) and return alignment events.
+
+        Events are dicts with a "type" of:
+          "ayah"           - an ayah was completed ("recited" WordSeq and "scores")
+          "jump"           - the reciter went back; cursor is now at "ayah"
+          "surah_complete" - the last ayah of "surah" was completed; "next_surah"
+                             is None at the end of the Quran
+        """
+        events = []
+        ids = self.vocab.ids_of(words).tolist()
+        for word, word_id in zip(words.words, ids):
+            if self.finished:
+                break
+            if self.skip_words:
+                self.skip_words -= 1
+                continue
+            self._push_word(word, word_id, events)
+        return events
+
+    def _push_word(self, word, word_id, events):
+        ayah = self.corpus.get(self.surah, self.ayah)
+        if ayah is None:
+            return
+
+        pos = len(self.words)
+        self.words.append(word)
+        self.ids.append(word_id)
+        self._attempt = None
+        self.scores.append(id_similarity(self.vocab, int(ayah.ids[pos]), word_id))
+        self._extend_window(word_id)
+
+        # Check for backward jumps before completing the current ayah
+        previous_ayah = self._find_backward_jump()
+        if previous_ayah:
+            self.ayah = previous_ayah + 1
+            self._reset_attempt()
+            self._reset_window()
+            events.append({"type": "jump", "surah": self.surah, "ayah": self.ayah})
+            return
+
+        if len(self.words) == ayah.word_count:
+            self._complete_ayah(ayah, events)
+
+    def _match_percent(self, expected_ids, word_ids):
+        """Share of word_ids matching the expected words at the same positions"""
+        count = min(len(expected_ids), len(word_ids))
+        scores = score_ids(self.vocab, expected_ids[:count], word_ids[:count])
+        return sum(score >= self.accuracy_threshold for score in scores) / len(word_ids) * 100
+
+    def _find_backward_jump(self):
+        """Return an earlier ayah that the window recites in full, if any.
+
+        Ayahs often share most of their words (2:82 and 2:39 differ in three
+        of eleven), so an earlier ayah only counts as a restart when the
+        window matches it better than the ayah at the cursor.
+        """
+        count = len(self.window_ids)
+        if count > self.corpus.longest_ayah[self.surah]:
+            # Nothing earlier can match any more; start a fresh window
+            word_id = self.window_ids[-1]
+            self._reset_window()
+            self._extend_window(word_id)
+            count = 1
+
+        # Only the few best voted ayahs get a full similarity check
+        current = None
+        for previous_ayah in self.restart_index.candidates(
+                self.surah, self.window_votes, count, self.ayah, limit=self.jump_candidates):
+            prev = self.corpus.get(self.surah, previous_ayah)
+            score = self._match_percent(prev.ids, self.window_ids)
+            if score < self.accuracy_threshold:
+                continue
+            if current is None:
+                current = self._match_percent(self.corpus.get(self.surah, self.ayah).ids, self.window_ids)
+            if score > current:
+                return previous_ayah
+        return None
+
+    def _complete_ayah(self, ayah, events):
+        accuracy = sum(score >= self.accuracy_threshold for score in self.scores) / ayah.word_count * 100
+        if accuracy < self.completion_accuracy:
+            # Too far off to count as this ayah; let the reciter start it again
+            self._reset_attempt()
+            return
+
+        events.append({
+            "type": "ayah",
+            "surah": self.surah,
+            "ayah": self.ayah,
+            "recited": self._attempt_seq(),
+            "scores": self.scores,
+        })
+        self._reset_attempt()
+        self._reset_window()
+        self.ayah += 1
+
+        # Check for surah completion
+        if self.ayah > self.corpus.max_ayah[self.surah]:
+            next_surah = self.surah + 1 if self.surah + 1 in self.corpus else None
+            events.append({"type": "surah_complete", "surah": self.surah, "next_surah": next_surah})
+            if next_surah is None:
+                self.finished = True
+            else:
+                self.surah = next_surah
+                self.ayah = 1
+
+    def align_partial(self, words=None):
+        """Lay the finalized attempt plus a partial WordSeq over the ayahs at the cursor.
+
+        Returns {ayah_num: {"recited": WordSeq, "scores": [...], "current_word_pos": int}}.
+        Only the partial words are scored; the finalized ones reuse their scores,
+        and so do the words a partial shares with the start of the previous one.
+        """
+        attempt = {}
+        if self.finished:
+            return attempt
+        if words and self.skip_words:
+            words = words[self.skip_words:]
+        ids = self.vocab.ids_of(words).tolist() if words else []
+
+        # A partial usually grows one word at a time: keep the scores of the
+        # words it has in common with the previous partial
+        key = (self.surah, self.ayah, len(self.words), self.skip_words)
+        reused = 0
+        if key == self.partial_key and words:
+            for previous, word_id in zip(self.partial_ids, ids):
+                if previous != word_id:
+                    break
+                reused += 1
+        partial_scores = self.partial_scores[:reused]
+
+        # The finalized words lead the first ayah, as a WordSeq kept between
+        # ticks; each ayah's share of the partial is a slice of the partial's WordSeq
+        recited = self._attempt_seq() if self.words else None
+        scores = self.scores
+        remaining = len(ids)
+        i = 0
+
+        ayah_num = self.ayah
+        ayah = self.corpus.get(self.surah, ayah_num)
+        while ayah and (recited is not None or i < remaining):
+            # Score this ayah's share of the partial words in one batch
+            pos = len(recited) if recited is not None else 0
+            take = min(ayah.word_count - pos, remaining - i)
+            if take > 0:
+                # Only the words past the reused prefix are scored
+                known = min(max(reused - i, 0), take)
+                if known < take:
+                    partial_scores.extend(score_ids(
+                        self.vocab, ayah.ids[pos + known:pos + take], ids[i + known:i + take]
+                    ))
+                share = partial_scores[i:i + take]
+                scores = scores + share if scores else share
+                part = words[i:i + take]
+                recited = part if recited is None else recited + part
+                i += take
+
+            attempt[ayah_num] = {
+                "recited": recited,
+                "scores": scores if scores is not self.scores else list(scores),
+                "current_word_pos": len(recited) - 1,
+            }
+
+            recited, scores = None, []
+            ayah_num += 1
+            ayah = self.corpus.get(self.surah, ayah_num)
+
+        self.partial_key = key
+        self.partial_ids = ids[:i]
+        self.partial_scores = partial_scores[:i]
+        return attempt
@@ -0,0 +1,55 @@
+from unicodedata import normalize
+
+from memo_cache import LRUCache
+
+# Recognizer output comes from a fixed lexicon, so the same words recur
+normalize_cache = LRUCache(50000)
+
+# Of the old similar-diacritics groups only these folds ever took effect:
+# kasratan -> kasra and dammatan -> damma. Tatweel is removed as well.
+_NORMALIZE_TABLE = str.maketrans({
+    'ٍ': 'ِ',  # Kasratan → Kasra
+    'ٌ': 'ُ',  # Dammatan → Damma
+    'ـ': None,  # Tatweel (elongation character)
+})
+
+# Harakat fathatan .. sukun removed, leaving the base letters
+_HARAKAT_TABLE = str.maketrans({chr(c): None for c in range(0x64B, 0x653)})
+_SKELETON_TABLE = str.maketrans({chr(c): None for c in [*range(0x64B, 0x653), 0x640]})
+
+def normalize_forms(text):
+    """Return (normalized text, diacritic-free skeleton) from a single NFC pass"""
+    forms = normalize_cache.get(text)
+    if forms is None:
+        forms = compute_forms(text)
+        normalize_cache.put(text, forms)
+    return forms
+
+def compute_forms(text):
+    """normalize_forms without the cache"""
+    composed = normalize('NFC', text)  # Normalize to composed form
+    return composed.translate(_NORMALIZE_TABLE), composed.translate(_SKELETON_TABLE)
+
+def normalize_arabic(text):
+    """Normalize Arabic text to standard form and group similar diacritics"""
+    return normalize_forms(text)[0]
+
+def strip_diacritics(text):
+    """Remove harakat (fathatan .. sukun) leaving only the base letters"""
+    return text.translate(_HARAKAT_TABLE)
+
+# Letters the recognizer commonly writes interchangeably, folded to one form,
+# and Quranic marks it never outputs, dropped
+_FOLD_TABLE = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    'ٰ': None,  # Superscript alif
+    **{chr(c): None for c in range(0x6D6, 0x6EE)},  # Pause and recitation marks
+})
+
+def fold_letters(skeleton):
+    """Loose lookup key for a diacritic-free word"""
+    return skeleton.translate(_FOLD_TABLE)
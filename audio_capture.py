@@ -0,0 +1,219 @@
+import math
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SAMPLE_BYTES = 2  # int16 mono
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+
+def block_frames(block_ms, sample_rate=SAMPLE_RATE):
+    """Frames per capture block for a block length in milliseconds"""
+    return sample_rate * block_ms // 1000
+
+
+class Resampler:
+    """Streaming polyphase resampler from source_rate to target_rate.
+
+    Each output sample is a windowed-sinc (Kaiser) low-pass of the input
+    with its cutoff just below the lower of the two Nyquist frequencies, so
+    content the target rate cannot hold (a 12 kHz tone in 48 kHz audio) is
+    filtered out instead of folding back as an alias. The filter history and
+    the position between input samples carry over from one process() call to
+    the next, so a stream resampled chunk by chunk is the same as resampled
+    whole; flush() returns the last samples once the stream ends.
+    """
+
+    def __init__(self, source_rate, target_rate=SAMPLE_RATE, zero_crossings=16, rolloff=0.9, beta=8.6):
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        step = math.gcd(source_rate, target_rate)
+        self.up, self.down = target_rate // step, source_rate // step
+        cutoff = rolloff * min(1.0, self.up / self.down)  # Fraction of the input Nyquist
+        self.half_width = math.ceil(zero_crossings / cutoff)
+
+        # One row of taps per phase (output position between two input samples)
+        offsets = np.arange(-self.half_width + 1, self.half_width + 1)
+        distance = offsets[None, :] - np.arange(self.up)[:, None] / self.up
+        window = np.i0(beta * np.sqrt(np.clip(1 - (distance / self.half_width) ** 2, 0, None))) / np.i0(beta)
+        taps = cutoff * np.sinc(cutoff * distance) * window
+        self.taps = (taps / taps.sum(axis=1, keepdims=True)).astype(np.float32)
+        self._offsets = offsets
+
+        # Input not yet consumed, starting at input index _start (zeros before the stream)
+        self._pending = np.zeros(self.half_width, dtype=np.float32)
+        self._start = -self.half_width
+        self._next = 0  # Index of the next output sample
+
+    def process(self, samples):
+        """Resample the next chunk of a mono float stream"""
+        if self.up == self.down:
+            return np.asarray(samples, dtype=np.float32)
+        self._pending = np.concatenate((self._pending, np.asarray(samples, dtype=np.float32)))
+        available = self._start + len(self._pending)  # Input samples received so far
+        # Output n sits at input position n * down / up and needs half_width inputs after it
+        end = max(((available - self.half_width) * self.up + self.down - 1) // self.down, self._next)
+        outputs = np.arange(self._next, end, dtype=np.int64)
+        base, phase = np.divmod(outputs * self.down, self.up)
+        index = (base - self._start)[:, None] + self._offsets[None, :]
+        result = np.einsum("ij,ij->i", self._pending[index], self.taps[phase])
+
+        self._next = end
+        keep = self._next * self.down // self.up - self.half_width + 1 - self._start
+        if keep > 0:
+            self._pending = self._pending[keep:]
+            self._start += keep
+        return result
+
+    def flush(self):
+        """The output still held back for want of later input, as if the stream ended in silence"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        # With half_width more inputs every output up to the end of the stream can be made
+        return self.process(np.zeros(self.half_width, dtype=np.float32))
+
+
+def to_pcm16(samples, sample_rate, target_rate=SAMPLE_RATE, resampler=None):
+    """Mono int16 audio at target_rate from audio of any rate, width or channel count.
+
+    Browser microphones deliver 44.1/48 kHz audio as int16 or float. The
+    samples are downmixed and resampled with an anti-aliasing filter. For a
+    stream sent in chunks, pass the stream's Resampler so the filter state
+    carries over; without one, samples are taken to be a whole recording.
+    """
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        samples = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    else:
+        samples = samples.astype(np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+
+    if sample_rate != target_rate:
+        if resampler is None:
+            resampler = Resampler(sample_rate, target_rate)
+            samples = np.concatenate((resampler.process(samples), resampler.flush()))
+        else:
+            samples = resampler.process(samples)
+
+    return np.ascontiguousarray(np.clip(samples * 32767, -32768, 32767).astype(np.int16))
+
+
+class AudioBuffer:
+    """Bounded ring buffer of int16 audio between capture and the decoder.
+
+    The ring is allocated once; each captured block is copied straight into
+    it, and the decoder takes everything queued so far in one read. When the
+    decoder falls behind by more than the capacity, the overflow policy
+    decides which audio goes: "drop_oldest" keeps the latest audio (the
+    reciter's current position), "drop_newest" keeps what is already queued.
+    """
+
+    def __init__(self, capacity_ms=10000, block_ms=50, sample_rate=SAMPLE_RATE, overflow="drop_oldest"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.sample_rate = sample_rate
+        self.block_bytes = block_frames(block_ms, sample_rate) * SAMPLE_BYTES
+        self.capacity = block_frames(capacity_ms, sample_rate) * SAMPLE_BYTES
+        self.overflow = overflow
+        self._ring = bytearray(self.capacity)
+        self._view = memoryview(self._ring)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Capture counters
+        self.writes = 0
+        self.reads = 0
+        self.overruns = 0
+        self.dropped_bytes = 0
+        self.status_errors = 0
+        self.max_depth = 0
+
+    def callback(self, indata, frames, time, status):
+        """sounddevice RawInputStream callback"""
+        if status:
+            self.status_errors += 1
+            print(status)
+        self.write(indata)
+
+    def _copy_in(self, data, offset):
+        end = offset + len(data)
+        if end <= self.capacity:
+            self._view[offset:end] = data
+        else:
+            split = self.capacity - offset
+            self._view[offset:] = data[:split]
+            self._view[:end - self.capacity] = data[split:]
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        with self._cond:
+            if self._closed:
+                return
+            self.writes += 1
+            free = self.capacity - self._size
+            if len(data) > free:
+                self.overruns += 1
+                excess = len(data) - free
+                if self.overflow == "drop_newest":
+                    self.dropped_bytes += excess
+                    data = data[:free]
+                else:
+                    if len(data) > self.capacity:
+                        # Only the tail of an oversized write fits at all
+                        self.dropped_bytes += len(data) - self.capacity
+                        data = data[len(data) - self.capacity:]
+                        excess = self._size
+                    self.dropped_bytes += excess
+                    self._start = (self._start + excess) % self.capacity
+                    self._size -= excess
+            if not data:
+                return
+            self._copy_in(data, (self._start + self._size) % self.capacity)
+            self._size += len(data)
+            self.max_depth = max(self.max_depth, self._size)
+            self._cond.notify()
+
+    def read(self):
+        """Block until audio is queued and take all of it.
+
+        Returns (data, blocks) where blocks is how many capture blocks the
+        data spans, or (None, 0) once the buffer is closed.
+        """
+        with self._cond:
+            while not self._size and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None, 0
+            end = self._start + self._size
+            if end <= self.capacity:
+                data = bytes(self._view[self._start:end])
+            else:
+                data = bytes(self._view[self._start:]) + bytes(self._view[:end - self.capacity])
+            self._start = self._size = 0
+            self.reads += 1
+        return data, -(-len(data) // self.block_bytes)
+
+    def close(self):
+        """Wake the reader and make it stop"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        to_ms = 1000 / (SAMPLE_BYTES * self.sample_rate)
+        with self._cond:
+            return {
+                "depth_ms": self._size * to_ms,
+                "max_depth_ms": self.max_depth * to_ms,
+                "capacity_ms": self.capacity * to_ms,
+                "writes": self.writes,
+                "reads": self.reads,
+                "overruns": self.overruns,
+                "dropped_ms": self.dropped_bytes * to_ms,
+                "status_errors": self.status_errors,
+            }
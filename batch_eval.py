@@ -0,0 +1,250 @@
+"""Grade recorded recitations offline.
+
+Streams WAV files through the recognizer as fast as the CPU allows and runs
+the same alignment and error scoring as a live recitation.
+
+    python batch_eval.py --surah 36 --workers 8 --out results.jsonl recordings/*.wav
+
+Use --surah 0 (the default) to locate where each recording starts.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+from vosk import Model, KaldiRecognizer
+
+from aligner import StreamingAligner
+from audio_capture import SAMPLE_RATE, SAMPLE_BYTES, to_pcm16
+from quran_corpus import WordSeq
+from corpus_cache import load_corpus, ensure_corpus_cache
+from quran_index import RestartIndex, QuranLocator
+from recitation import record_ayah, rewind, start_surah, generate_error_report
+from sessions import new_state
+
+DEFAULT_MODEL = "E:/FYP/vosk-model-ar-0.22-linto-1.1.0"
+DEFAULT_QURAN = "E:/FYP/quran-simple.txt"
+
+
+def read_wav(path):
+    """The audio of a WAV file as 16 kHz mono int16 PCM bytes"""
+    with wave.open(path, "rb") as wav:
+        rate = wav.getframerate()
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        frames = wav.readframes(wav.getnframes())
+
+    if rate == SAMPLE_RATE and channels == 1 and width == SAMPLE_BYTES:
+        return frames
+    if width not in (1, 2, 4):
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+    samples = np.frombuffer(frames, {1: np.uint8, 2: np.int16, 4: np.int32}[width]).reshape(-1, channels)
+    if width == 1:
+        # 8-bit WAV is unsigned
+        samples = (samples.astype(np.int16) - 128) * 256
+    return to_pcm16(samples, rate).tobytes()
+
+
+class BatchEvaluator:
+    """Runs recordings through one loaded model and the live alignment code"""
+
+    def __init__(self, model, corpus, restart_index=None, locator=None, accuracy_threshold=67, chunk_ms=250,
+                 locate_max_words=12):
+        self.model = model
+        self.corpus = corpus
+        self.restart_index = restart_index or RestartIndex(corpus)
+        self.locator = locator
+        self.accuracy_threshold = accuracy_threshold
+        self.locate_max_words = locate_max_words
+        self.chunk_bytes = SAMPLE_RATE * chunk_ms // 1000 * SAMPLE_BYTES
+
+    def _locate(self, state):
+        if self.locator is None:
+            self.locator = QuranLocator(self.corpus)
+        # As in the app, only the most recent words are searched for
+        del state["locate_words"][:-self.locate_max_words]
+        finals = WordSeq.from_text(" ".join(state["locate_words"]))
+        match = self.locator.locate(finals, max_words=self.locate_max_words, accuracy_threshold=self.accuracy_threshold)
+        if not match:
+            return None, [], None
+        aligner = StreamingAligner(self.corpus, match["surah"], match["ayah"],
+                                   accuracy_threshold=self.accuracy_threshold,
+                                   restart_index=self.restart_index, skip_words=match["skip_words"])
+        state["surah"] = aligner.surah
+        return aligner, aligner.accept_final(finals), match
+
+    def evaluate(self, path, surah=0):
+        """Grade one recording; surah 0 locates where it starts"""
+        started = time.perf_counter()
+        pcm = read_wav(path)
+        rec = KaldiRecognizer(self.model, SAMPLE_RATE)
+        rec.SetWords(True)
+
+        state = new_state(int(surah or 1))
+        aligner = start = None
+        if surah:
+            aligner = StreamingAligner(self.corpus, int(surah), accuracy_threshold=self.accuracy_threshold,
+                                       restart_index=self.restart_index)
+            start = {"surah": aligner.surah, "ayah": aligner.ayah, "skip_words": 0}
+        ayahs = {}  # (surah, ayah) -> result of its latest recitation
+        jumps = []
+        surahs = []
+
+        def finish_surah(complete):
+            surahs.append({
+                "surah": state["surah"],
+                "complete": complete,
+                "ayahs_recited": len(state["recited_ayahs"]),
+                "error_count": state["report"].error_count,
+                "report": generate_error_report(state),
+            })
+
+        def accept(text):
+            nonlocal aligner, start
+            if aligner is None:
+                state["locate_words"].extend(text.split())
+                aligner, events, match = self._locate(state)
+                if aligner is None:
+                    return
+                # The aligner has already replayed the located words, so
+                # its cursor is past the start of the recitation
+                start = {"surah": match["surah"], "ayah": match["ayah"], "skip_words": match["skip_words"]}
+            else:
+                events = aligner.accept_final(WordSeq.from_text(text))
+
+            for event in events:
+                if event["type"] == "jump":
+                    rewind(state, event["ayah"])
+                    jumps.append({"surah": event["surah"], "ayah": event["ayah"]})
+                    for key in [key for key in ayahs if key[0] == event["surah"] and key[1] >= event["ayah"]]:
+                        del ayahs[key]
+
+                elif event["type"] == "ayah":
+                    ayah = self.corpus.get(event["surah"], event["ayah"])
+                    _, correct, error_details = record_ayah(state, ayah, event, self.accuracy_threshold)
+                    ayahs[(event["surah"], event["ayah"])] = {
+                        "surah": event["surah"],
+                        "ayah": event["ayah"],
+                        "expected": ayah.raw_text,
+                        "recited": event["recited"].text(),
+                        "words": ayah.word_count,
+                        "correct": correct,
+                        "accuracy": correct / ayah.word_count * 100 if ayah.word_count else 0.0,
+                        "errors": [dict(error, similarity=int(error["similarity"])) for error in error_details],
+                    }
+
+                elif event["type"] == "surah_complete":
+                    finish_surah(True)
+                    if event["next_surah"] is None:
+                        break
+                    start_surah(state, event["next_surah"])
+
+        for offset in range(0, len(pcm), self.chunk_bytes):
+            if aligner is not None and aligner.finished:
+                break
+            if rec.AcceptWaveform(pcm[offset:offset + self.chunk_bytes]):
+                text = json.loads(rec.Result()).get("text", "").strip()
+                if text:
+                    accept(text)
+        text = json.loads(rec.FinalResult()).get("text", "").strip()
+        if text and not (aligner is not None and aligner.finished):
+            accept(text)
+        # A recording that ends the Quran has already reported its last surah
+        if state["recited_ayahs"] and not (aligner is not None and aligner.finished):
+            finish_surah(False)
+
+        words = sum(entry["words"] for entry in ayahs.values())
+        correct = sum(entry["correct"] for entry in ayahs.values())
+        audio_seconds = len(pcm) / (SAMPLE_RATE * SAMPLE_BYTES)
+        elapsed = time.perf_counter() - started
+        return {
+            "file": path,
+            "start": start,  # None if the recording could not be located
+            "ayahs": [ayahs[key] for key in sorted(ayahs)],
+            "jumps": jumps,
+            "surahs": surahs,
+            "words": words,
+            "correct": correct,
+            "accuracy": correct / words * 100 if words else 0.0,
+            "error_count": words - correct,
+            "audio_seconds": audio_seconds,
+            "decode_seconds": elapsed,
+            "realtime_factor": elapsed / audio_seconds if audio_seconds else 0.0,
+        }
+
+
+_evaluator = None
+
+
+def _init_worker(model_path, quran_path, accuracy_threshold):
+    """Load the model and corpus once per worker process"""
+    global _evaluator
+    corpus, _ = load_corpus(quran_path)
+    _evaluator = BatchEvaluator(Model(model_path), corpus, accuracy_threshold=accuracy_threshold)
+
+
+def _evaluate_job(job):
+    path, surah = job
+    try:
+        return _evaluator.evaluate(path, surah)
+    except Exception as e:
+        return {"file": path, "error": repr(e)}
+
+
+def evaluate_files(jobs, model_path=DEFAULT_MODEL, quran_path=DEFAULT_QURAN, workers=1, accuracy_threshold=67):
+    """Grade many recordings, yielding each result as soon as it is ready.
+
+    jobs are WAV paths, or (path, surah) pairs to start tracking at a known
+    surah. With workers > 1 the files are graded in parallel processes.
+    """
+    jobs = [(job, 0) if isinstance(job, str) else tuple(job) for job in jobs]
+    initargs = (model_path, quran_path, accuracy_threshold)
+    # Built once here so the workers only map it
+    ensure_corpus_cache(quran_path)
+    if workers <= 1:
+        _init_worker(*initargs)
+        for job in jobs:
+            yield _evaluate_job(job)
+        return
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        yield from pool.imap_unordered(_evaluate_job, jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade recorded recitations (WAV files) offline")
+    parser.add_argument("files", nargs="+", help="WAV recordings")
+    parser.add_argument("--surah", type=int, default=0, help="Surah recited in every file; 0 locates it")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Vosk model folder")
+    parser.add_argument("--quran", default=DEFAULT_QURAN, help="Quran text file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--accuracy-threshold", type=int, default=67)
+    parser.add_argument("--out", help="Write results as JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    failed = 0
+    try:
+        jobs = [(path, args.surah) for path in args.files]
+        workers = min(args.workers, len(jobs))
+        for result in evaluate_files(jobs, args.model, args.quran, workers, args.accuracy_threshold):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            if "error" in result:
+                failed += 1
+                print(f"{result['file']}: failed: {result['error']}", file=sys.stderr)
+            else:
+                print(f"{result['file']}: {len(result['ayahs'])} ayahs, {result['accuracy']:.1f}% accurate, "
+                      f"{result['realtime_factor']:.2f}x realtime", file=sys.stderr)
+    finally:
+        if args.out:
+            out.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Fill a recitation history store with synthetic sessions and time the
+recording and the per-student queries.
+
+"record" is what the recognition loop pays per ayah (queueing only),
+"write" the writer thread's throughput until everything is committed, and
+the query times are the median over the students.
+
+Run from the project folder:  python benchmarks/bench_history.py
+    --sessions 5000 --students 100   size of the history
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history import HistoryStore
+from quran_corpus import load_quran
+
+QURAN_FILE = os.path.join(ROOT, "quran-simple.txt")
+
+
+def fill(store, quran, rng, sessions, students, ayahs_per_session, error_rate):
+    """Record synthetic recitations; returns the seconds spent in record_ayah and the ayah count"""
+    spent = 0.0
+    count = 0
+    for _ in range(sessions):
+        student = f"student-{rng.randrange(students)}"
+        surah = rng.randint(1, 114)
+        recitation = store.start_recitation(student, surah=surah)
+        for ayah_num in quran.ayah_numbers(surah)[:ayahs_per_session]:
+            ayah = quran.get(surah, ayah_num)
+            scores = [100 if rng.random() > error_rate else rng.randint(20, 66) for _ in ayah.words]
+            correct = sum(score >= 67 for score in scores)
+            start = time.perf_counter()
+            store.record_ayah(recitation, surah, ayah_num, scores, ayah.words, ayah.word_count, correct)
+            spent += time.perf_counter() - start
+            count += 1
+        store.finish_recitation(recitation)
+    return spent, count
+
+
+def timed_queries(store, students, runs=20):
+    names = [f"student-{i}" for i in range(min(students, runs))]
+    results = {}
+    for name, query in (("weakest_ayahs", store.weakest_ayahs), ("weakest_words", store.weakest_words),
+                        ("student_summary", store.student_summary)):
+        times = []
+        for student in names:
+            start = time.perf_counter()
+            query(student)
+            times.append(time.perf_counter() - start)
+        results[name] = statistics.median(times) * 1000
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--ayahs", type=int, default=20, help="Ayahs recited per session")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    quran = load_quran(QURAN_FILE)
+    with tempfile.TemporaryDirectory() as folder:
+        store = HistoryStore(os.path.join(folder, "history.sqlite3"))
+        started = time.perf_counter()
+        spent, ayahs = fill(store, quran, random.Random(args.seed), args.sessions, args.students,
+                            args.ayahs, args.error_rate)
+        store.flush()
+        elapsed = time.perf_counter() - started
+        words = store._query("SELECT COUNT(*) AS n FROM word_results", ())[0]["n"]
+
+        print(f"{args.sessions} sessions, {ayahs} ayahs, {words} words recorded")
+        print(f"record       {spent / ayahs * 1e6:8.1f} us per ayah (recognition loop)")
+        print(f"write        {ayahs / elapsed:8.0f} ayahs/s ({elapsed:.2f} s until committed)")
+        for name, ms in timed_queries(store, args.students).items():
+            print(f"{name:<16} {ms:8.2f} ms")
+        print(f"database     {os.path.getsize(store.path) / 2**20:8.1f} MiB")
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Check the table-driven normalize_arabic against the original loop version
+for every word of the Quran text, then time both.
+
+Run from the project folder:  python benchmarks/bench_normalize.py
+Exits with status 1 if any word normalizes differently.
+"""
+import os
+import sys
+import time
+from unicodedata import normalize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from arabic_text import normalize_forms, compute_forms
+
+
+def legacy_normalize_arabic(text):
+    """normalize_arabic as it was before the translation tables"""
+    text = normalize('NFC', text)  # Normalize to composed form
+    
+    # Define groups of similar diacritics that should be considered equivalent
+    similar_diacritics = {
+        'َ': ['ً'],  # Fatha and Fathatan are similar
+        'ِ': ['ٍ'],  # Kasra and Kasratan are similar
+        'ُ': ['ٌ'],  # Damma and Dammatan are similar
+        'ْ': [],     # Sukun
+        'ّ': [],    # Shadda
+        'َ': 'ا',  # Fatha (Zabr) → Alif
+        'ً': 'ا',  # Fathatan → Alif
+        'ا': 'ا',  # Alif remains Alif
+    }
+    
+    # Replace similar diacritics with their base form
+    replacements = {}
+    for base, equivalents in similar_diacritics.items():
+        for equiv in equivalents:
+            replacements[equiv] = base
+    
+    # Apply the replacements
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    
+    # Remove tatweel (elongation character)
+    text = text.replace('ـ', '')
+    
+    return text
+
+def legacy_strip_diacritics(text):
+    return ''.join([c for c in text if not (0x64B <= ord(c) <= 0x652)])
+
+def quran_words():
+    words = []
+    with open(os.path.join(ROOT, "quran-simple.txt"), 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('|')
+            if len(parts) == 3:
+                words.extend(parts[2].split())
+    return words
+
+def main():
+    words = quran_words()
+    unique = sorted(set(words))
+
+    mismatches = 0
+    for word in unique:
+        expected = legacy_normalize_arabic(word)
+        if normalize_forms(word) != (expected, legacy_strip_diacritics(expected)):
+            mismatches += 1
+            print(f"mismatch: {word!r}")
+    print(f"{len(unique)} distinct words ({len(words)} total), {mismatches} mismatches")
+
+    start = time.perf_counter()
+    for word in words:
+        legacy_strip_diacritics(legacy_normalize_arabic(word))
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for word in words:
+        compute_forms(word)
+    table_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for word in words:
+        normalize_forms(word)
+    cached_time = time.perf_counter() - start
+
+    print(f"loop + replace: {legacy_time / len(words) * 1e6:.2f} us/word")
+    print(f"translate:      {table_time / len(words) * 1e6:.2f} us/word "
+          f"({legacy_time / table_time:.1f}x)")
+    print(f"cached:         {cached_time / len(words) * 1e6:.2f} us/word")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
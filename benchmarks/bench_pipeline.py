@@ -0,0 +1,216 @@
+"""Replay scripted recitations through the live alignment and rendering
+pipeline and report per-tick latency, throughput and memory.
+
+Each tick is one recognizer step as in recognize_generator: parse the
+result, align finalized words, score and record completed ayahs, lay the
+partial over the text and produce the display patch. Ticks whose partial
+did not change skip the highlighting, as they do live.
+
+Run from the project folder:  python benchmarks/bench_pipeline.py
+    --save-baseline   store the results as the baseline for this machine
+Later runs compare against the saved baseline and exit with 1 when a metric
+got worse by more than --tolerance.
+
+The run also fails when a scenario without faults (correct, pauses) does not
+track the whole surah, since its timings then only cover part of it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aligner import StreamingAligner
+from quran_corpus import load_quran, WordSeq
+from quran_index import RestartIndex
+from recitation import align_attempt, record_ayah, rewind, start_surah, generate_error_report
+from rendering import SurahView, get_template
+from scripted_recognizer import ScriptedRecognizer, build_script
+from sessions import new_state
+from similarity import pair_cache
+from arabic_text import normalize_cache
+
+QURAN_FILE = os.path.join(ROOT, "quran-simple.txt")
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines", "bench_pipeline.json")
+
+SURAHS = {"short": 67, "long": 2}
+SCENARIOS = {
+    "correct": {},
+    "errors": {"error_rate": 0.15},
+    "skips": {"skip_rate": 0.08},
+    "jumps": {"jump_every": 10},
+    "pauses": {"hold": 3},
+}
+
+# Scenarios that recite every ayah once, in order, so they must track the whole surah
+COMPLETE_SCENARIOS = ("correct", "pauses")
+
+# Metric -> True if higher is better
+METRICS = {"p50_ms": False, "p90_ms": False, "p99_ms": False, "ayahs_per_s": True, "peak_kib": False}
+
+
+def replay(quran, restart_index, surah, utterances, hold=1, window=10, accuracy_threshold=67):
+    """Run one recitation; returns per-tick seconds and the ayah/jump event counts"""
+    rec = ScriptedRecognizer(utterances, hold)
+    state = new_state(surah)
+    aligner = StreamingAligner(quran, surah, accuracy_threshold=accuracy_threshold, restart_index=restart_index)
+    view = SurahView(get_template(quran, surah), window=window)
+    ticks = []
+    ayahs = jumps = 0
+    last_partial = None
+
+    while not rec.done and not aligner.finished:
+        start = time.perf_counter()
+        events = []
+        text = partial_text = ""
+        if rec.AcceptWaveform(b""):
+            text = json.loads(rec.Result()).get("text", "").strip()
+            if text:
+                events = aligner.accept_final(WordSeq.from_text(text))
+                state["partial_result"] = ""
+        else:
+            partial_text = json.loads(rec.PartialResult()).get("partial", "").strip()
+        if partial_text:
+            state["partial_result"] = partial_text
+
+        for event in events:
+            if event["type"] == "jump":
+                jumps += 1
+                rewind(state, event["ayah"])
+                view.forget_recited([n for n in view.recited if n >= event["ayah"]])
+            elif event["type"] == "ayah":
+                ayahs += 1
+                highlighted, _, _ = record_ayah(state, quran.get(event["surah"], event["ayah"]), event,
+                                                accuracy_threshold)
+                view.set_recited(event["ayah"], highlighted)
+            elif event["type"] == "surah_complete":
+                state["completed_surahs"] = [{"surah_num": event["surah"], "report": generate_error_report(state)}]
+                if event["next_surah"] is None:
+                    break
+                start_surah(state, event["next_surah"])
+                view = SurahView(get_template(quran, event["next_surah"]), window=window)
+
+        state["surah"], state["ayah"] = aligner.surah, aligner.ayah
+        if text or state["partial_result"] != last_partial:
+            last_partial = state["partial_result"]
+            current_attempt = align_attempt(quran, aligner, state["partial_result"], accuracy_threshold)
+            state["current_attempt"] = current_attempt
+            view.set_attempt({n: attempt["highlighted"] for n, attempt in current_attempt.items()})
+            view.set_cursor(state["ayah"] if not current_attempt else None)
+            if view.follow(state["ayah"]):
+                view.html()
+        view.take_patch()
+        ticks.append(time.perf_counter() - start)
+
+        if state["completed_surahs"]:
+            # The scripts recite one surah
+            break
+    return ticks, ayahs, jumps
+
+
+def run_case(quran, restart_index, surah, utterances, hold=1):
+    # Cold caches so each case pays for its own scoring
+    pair_cache.clear()
+    normalize_cache.clear()
+    quran.vocab.pair_cache.clear()
+    ticks, ayahs, jumps = replay(quran, restart_index, surah, utterances, hold)
+    ms = np.array(ticks) * 1000
+
+    pair_cache.clear()
+    normalize_cache.clear()
+    quran.vocab.pair_cache.clear()
+    tracemalloc.start()
+    replay(quran, restart_index, surah, utterances, hold)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ticks": len(ticks),
+        "ayahs": ayahs,
+        "jumps": jumps,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "ayahs_per_s": ayahs / (ms.sum() / 1000) if ms.sum() else 0.0,
+        "peak_kib": peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every metric against the baseline; returns the regressions"""
+    regressions = []
+    print(f"\n{'case':<16} {'metric':<12} {'baseline':>10} {'now':>10} {'change':>8}")
+    for case, metrics in results.items():
+        if case not in baseline:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, now = baseline[case][metric], metrics[metric]
+            if not before:
+                continue
+            change = (now - before) / before
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append((case, metric))
+            print(f"{case:<16} {metric:<12} {before:>10.3f} {now:>10.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save-baseline", action="store_true", help="Save these results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    quran = load_quran(QURAN_FILE)
+    restart_index = RestartIndex(quran)
+
+    results = {}
+    incomplete = []
+    print(f"{'case':<16} {'ticks':>6} {'ayahs':>6} {'jumps':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'ayahs/s':>9} {'peak KiB':>9}")
+    for length, surah in SURAHS.items():
+        for scenario, options in SCENARIOS.items():
+            options = dict(options)
+            hold = options.pop("hold", 1)
+            utterances = build_script(quran, surah, random.Random(args.seed), **options)
+            case = f"{length}-{scenario}"
+            r = results[case] = run_case(quran, restart_index, surah, utterances, hold)
+            print(f"{case:<16} {r['ticks']:>6} {r['ayahs']:>6} {r['jumps']:>6} {r['p50_ms']:>8.3f} {r['p90_ms']:>8.3f} "
+                  f"{r['p99_ms']:>8.3f} {r['max_ms']:>8.3f} {r['ayahs_per_s']:>9.1f} {r['peak_kib']:>9.1f}")
+            total = len(quran.ayah_numbers(surah))
+            if scenario in COMPLETE_SCENARIOS and r["ayahs"] < total:
+                incomplete.append(f"{case} tracked {r['ayahs']} of {total} ayahs")
+
+    if incomplete:
+        print("\nINCOMPLETE (tracking stopped before the end of the surah):")
+        for line in incomplete:
+            print(f"  {line}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if incomplete else 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet; run with --save-baseline to keep one")
+        return 1 if incomplete else 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    return 1 if regressions or incomplete else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
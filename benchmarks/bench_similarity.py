@@ -0,0 +1,62 @@
+"""Compare per-pair word_similarity calls with the batch score_pairs kernel,
+both from a cold word-pair cache, and the batch call again with a warm cache.
+
+Run from the project folder:  python benchmarks/bench_similarity.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quran_corpus import load_quran
+from similarity import word_similarity, score_pairs, pair_cache, cache_stats
+
+QURAN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quran-simple.txt")
+
+
+def make_pairs(quran, count, rng):
+    """Expected words paired with exact, diacritic-dropped and unrelated recitations"""
+    forms = sorted({pair for ayah in quran.iter_ayahs() for pair in zip(ayah.norm_words, ayah.skeleton_words)})
+    expected, recited = [], []
+    for _ in range(count):
+        norm, base = rng.choice(forms)
+        roll = rng.random()
+        if roll < 0.3:
+            recited.append((norm, base))
+        elif roll < 0.6:
+            dropped = ''.join(c for c in norm if not (0x64B <= ord(c) <= 0x652 and rng.random() < 0.5))
+            recited.append((dropped, base))
+        else:
+            recited.append(rng.choice(forms))
+        expected.append((norm, base))
+    return ([e[0] for e in expected], [e[1] for e in expected],
+            [r[0] for r in recited], [r[1] for r in recited])
+
+def timed(fn, repeat, cold=True):
+    elapsed = 0.0
+    for _ in range(repeat):
+        if cold:
+            pair_cache.clear()
+        start = time.perf_counter()
+        result = fn()
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat, result
+
+def main():
+    rng = random.Random(0)
+    quran = load_quran(QURAN_FILE)
+    print(f"{'pairs':>8} {'per-pair us':>12} {'batch us':>10} {'speedup':>8} {'warm us':>9}  identical")
+    for count, repeat in ((10, 2000), (50, 500), (300, 100), (6000, 5)):
+        pairs = make_pairs(quran, count, rng)
+        scalar_time, scalar = timed(lambda: [word_similarity(*p) for p in zip(*pairs)], repeat)
+        batch_time, batch = timed(lambda: score_pairs(*pairs), repeat)
+        warm_time, _ = timed(lambda: score_pairs(*pairs), repeat, cold=False)
+        identical = scalar == batch.tolist()
+        print(f"{count:>8} {scalar_time * 1e6:>12.1f} {batch_time * 1e6:>10.1f} "
+              f"{scalar_time / batch_time:>7.1f}x {warm_time * 1e6:>9.1f}  {identical}")
+    print(cache_stats()["word_pairs"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Time the start-up steps of the app, each in a fresh Python process.
+
+"until_ui" is what still blocks before the app serves its first page (the
+imports and mapping the corpus cache); "until_ready" adds what loads in the
+background: the search indexes and, with --model, the Vosk model. Parsing
+the text files (load_quran, load_surah_names) is timed for comparison.
+
+Run from the project folder:  python benchmarks/bench_startup.py
+    --model PATH      also time loading the acoustic model
+    --save-baseline   store the results as the baseline for this machine
+Later runs compare against the saved baseline and exit with 1 when a step
+got slower by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines", "bench_startup.json")
+
+# Run in a child process so every step starts cold, as it does when the app starts
+CHILD = r"""
+import json, sys, time
+timings = {}
+start = time.perf_counter()
+for module in ("gradio", "vosk"):
+    try:
+        __import__(module)
+    except ImportError:
+        pass
+from quran_corpus import load_quran, load_surah_names
+from corpus_cache import load_corpus
+from quran_index import RestartIndex, QuranLocator
+timings["imports"] = time.perf_counter() - start
+
+def step(name, fn, *args):
+    global start
+    start = time.perf_counter()
+    result = fn(*args)
+    timings[name] = time.perf_counter() - start
+    return result
+
+step("load_quran", load_quran, "quran-simple.txt")
+step("load_surah_names", load_surah_names, "surah_mapping_arabic.txt")
+quran, _ = step("load_corpus", load_corpus, "quran-simple.txt", "surah_mapping_arabic.txt")
+step("restart_index", RestartIndex, quran)
+step("locator", QuranLocator, quran)
+if len(sys.argv) > 1:
+    from vosk import Model
+    step("model", Model, sys.argv[1])
+print(json.dumps(timings))
+"""
+
+BLOCKING = ("imports", "load_corpus")
+BACKGROUND = ("restart_index", "locator", "model")
+
+
+def build_cache():
+    """Build the corpus cache up front, as the first start of the app does"""
+    sys.path.insert(0, ROOT)
+    from corpus_cache import ensure_corpus_cache
+    ensure_corpus_cache(os.path.join(ROOT, "quran-simple.txt"), os.path.join(ROOT, "surah_mapping_arabic.txt"))
+
+
+def run_once(model=None):
+    args = [sys.executable, "-c", CHILD] + ([model] if model else [])
+    out = subprocess.run(args, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure(runs, model=None):
+    """Median seconds of every step over several cold starts"""
+    build_cache()
+    samples = [run_once(model) for _ in range(runs)]
+    results = {step: statistics.median(sample[step] for sample in samples) for step in samples[0]}
+    results["until_ui"] = sum(results[step] for step in BLOCKING)
+    results["until_ready"] = results["until_ui"] + sum(results.get(step, 0.0) for step in BACKGROUND)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every step against the baseline; returns the regressions"""
+    regressions = []
+    print(f"\n{'step':<18} {'baseline':>10} {'now':>10} {'change':>8}")
+    for step, now in results.items():
+        before = baseline.get(step)
+        # Steps of a few milliseconds are mostly noise
+        if not before or before < 0.005:
+            continue
+        change = (now - before) / before
+        flag = "  REGRESSION" if change > tolerance else ""
+        if flag:
+            regressions.append(step)
+        print(f"{step:<18} {before:>10.3f} {now:>10.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="Vosk model folder to time loading too")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save-baseline", action="store_true", help="Save these results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs, args.model)
+    print(f"{'step':<18} {'seconds':>8}")
+    for step, seconds in results.items():
+        print(f"{step:<18} {seconds:>8.3f}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet; run with --save-baseline to keep one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""A KaldiRecognizer stand-in that replays scripted recognizer output, plus
+scripts of correct and faulty recitations built from the corpus.
+
+No microphone or Vosk model is needed: every `hold` AcceptWaveform() calls
+reveal one more word of the current utterance as a partial result, and the
+last word of an utterance turns it into a final result. A hold above 1 is
+like pauses and long vowels, where the partial does not change between
+audio blocks.
+"""
+import json
+
+
+class ScriptedRecognizer:
+    def __init__(self, utterances, hold=1):
+        self.utterances = [list(words) for words in utterances if words]
+        self.hold = hold
+        self.Reset()
+
+    def SetWords(self, enabled):
+        pass
+
+    def Reset(self):
+        self._utterance = 0
+        self._heard = 0
+        self._blocks = 0
+        self._result = ""
+
+    @property
+    def done(self):
+        return self._utterance >= len(self.utterances)
+
+    def AcceptWaveform(self, data):
+        if self.done:
+            return False
+        self._blocks += 1
+        if self._blocks % self.hold:
+            return False
+        words = self.utterances[self._utterance]
+        self._heard += 1
+        if self._heard < len(words):
+            return False
+        self._result = " ".join(words)
+        self._utterance += 1
+        self._heard = 0
+        return True
+
+    def Result(self):
+        return json.dumps({"text": self._result}, ensure_ascii=False)
+
+    def FinalResult(self):
+        return self.Result()
+
+    def PartialResult(self):
+        partial = self.utterances[self._utterance][:self._heard] if not self.done else []
+        return json.dumps({"partial": " ".join(partial)}, ensure_ascii=False)
+
+
+def build_script(corpus, surah, rng, error_rate=0.0, skip_rate=0.0, jump_every=0, max_utterance=12):
+    """Utterances reciting a whole surah, one pause per ayah (long ayahs are split).
+
+    error_rate replaces words with random other words of the surah, skip_rate
+    leaves words out, and every jump_every ayahs the reciter goes back two
+    ayahs and recites them again.
+    """
+    ayahs = [corpus.get(surah, n) for n in corpus.ayah_numbers(surah)]
+    vocabulary = [word for ayah in ayahs for word in ayah.words]
+    order = []
+    for i, ayah in enumerate(ayahs):
+        order.append(ayah)
+        if jump_every and i >= 2 and (i + 1) % jump_every == 0:
+            order.extend(ayahs[i - 2:i + 1])
+
+    utterances = []
+    for ayah in order:
+        words = []
+        for word in ayah.words:
+            roll = rng.random()
+            if roll < skip_rate:
+                continue
+            words.append(rng.choice(vocabulary) if roll < skip_rate + error_rate else word)
+        for start in range(0, len(words), max_utterance):
+            utterances.append(words[start:start + max_utterance])
+    return utterances
@@ -0,0 +1,231 @@
+"""Binary cache of the Quran corpus, loaded with mmap instead of parsed.
+
+The text, the surah names, the vocabulary of normalized and skeleton word
+forms and every word of the corpus as a vocabulary ID are compiled once
+into one file of flat arrays. Opening it maps the file
+read-only, so every process using it (decoder and batch workers included)
+shares the same pages, and ayahs are only turned into Python objects when
+they are first used.
+
+    python corpus_cache.py quran-simple.txt surah_mapping_arabic.txt
+
+builds quran-simple.hifz next to the text. load_corpus() does the same on
+first use and rebuilds whenever the text files change.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from quran_corpus import QuranCorpus, Ayah, Vocabulary, load_quran, load_surah_names
+
+MAGIC = b"HIFZQRN\x00"
+VERSION = 2
+ALIGN = 8
+
+# Separates the vocabulary's word forms; unlike a space it survives any word
+WORD_SEP = "\x1f"
+
+
+def default_cache_path(quran_path):
+    return os.path.splitext(quran_path)[0] + ".hifz"
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _blob(texts):
+    """UTF-8 of the texts back to back, and the byte offset where each starts (plus the end)"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def build_corpus_cache(quran_path, names_path=None, cache_path=None):
+    """Compile the Quran text (and surah names) into a cache file; returns its path"""
+    cache_path = cache_path or default_cache_path(quran_path)
+    corpus = load_quran(quran_path)
+    if not len(corpus):
+        raise ValueError(f"No ayahs found in {quran_path}")
+    names = load_surah_names(names_path) if names_path else {}
+
+    ayahs = list(corpus.iter_ayahs())
+    # An ayah's row is found from its number, so each surah must number its ayahs 1..n
+    for surah in corpus.surahs:
+        if corpus.ayah_numbers(surah) != list(range(1, corpus.max_ayah[surah] + 1)):
+            raise ValueError(f"Surah {surah} does not number its ayahs from 1 without gaps")
+    raw, raw_offsets = _blob(ayah.raw_text for ayah in ayahs)
+    name_numbers = sorted(names)
+    name_text, name_offsets = _blob(names[n]["ar"] for n in name_numbers)
+
+    sections = {
+        "word_ids": corpus.word_ids.astype(np.int32),
+        "ayah_offsets": corpus.ayah_offsets,
+        "surah_offsets": corpus.surah_offsets,
+        "vocab_norm": _blob([WORD_SEP.join(corpus.vocab.norms)])[0],
+        "vocab_skeleton": _blob([WORD_SEP.join(corpus.vocab.skeletons)])[0],
+        "raw": raw,
+        "raw_offsets": raw_offsets,
+        "name_number": np.array(name_numbers, dtype=np.int16),
+        "name": name_text,
+        "name_offsets": name_offsets,
+    }
+
+    # Sections are laid out after the header at 8-byte boundaries so they map as aligned arrays
+    layout = {}
+    offset = 0
+    for name, array in sections.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({
+        "version": VERSION,
+        "quran_sha1": file_digest(quran_path),
+        "names_sha1": file_digest(names_path) if names_path else None,
+        "sections": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGN)
+
+    # Written under a temporary name so readers never see half a file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for array in sections.values():
+            data = array.tobytes()
+            f.write(data + b"\0" * (-len(data) % ALIGN))
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def _read_header(buffer):
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a corpus cache file")
+    (length,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+    start = len(MAGIC) + 8
+    return json.loads(bytes(buffer[start:start + length])), start + length
+
+
+class MappedCorpus(QuranCorpus):
+    """QuranCorpus read from a memory-mapped cache file.
+
+    The arrays, word_ids and its offsets included, are views of the mapping,
+    not copies. An Ayah is built from them the first time it is asked for
+    and kept, as QuranCorpus keeps them.
+    """
+
+    def __init__(self, cache_path):
+        self.path = cache_path
+        with open(cache_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header, data_start = _read_header(self._map)
+        if self.header.get("version") != VERSION:
+            raise ValueError(f"Corpus cache version {self.header.get('version')} is not {VERSION}")
+        self.arrays = {
+            name: np.frombuffer(self._map, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+            for name, (dtype, offset, count) in self.header["sections"].items()
+        }
+
+        # The vocabulary is needed as strings to map recognized words to IDs
+        vocab = Vocabulary(self.arrays["vocab_norm"].tobytes().decode("utf-8").split(WORD_SEP),
+                           self.arrays["vocab_skeleton"].tobytes().decode("utf-8").split(WORD_SEP))
+        super().__init__(vocab)
+        self.word_ids = self.arrays["word_ids"]
+        self.ayah_offsets = self.arrays["ayah_offsets"]
+        self.surah_offsets = self.arrays["surah_offsets"]
+
+        word_counts = np.diff(self.ayah_offsets)
+        for surah in range(len(self.surah_offsets) - 1):
+            first, end = int(self.surah_offsets[surah]), int(self.surah_offsets[surah + 1])
+            if end > first:
+                self.surahs[surah] = {}
+                self.max_ayah[surah] = end - first
+                self.longest_ayah[surah] = int(word_counts[first:end].max())
+
+    def _text(self, name, index):
+        offsets = self.arrays[name + "_offsets"]
+        return self.arrays[name][offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+
+    def get(self, surah, ayah):
+        entry = self.surahs.get(surah, {}).get(ayah)
+        if entry is None:
+            if not 1 <= ayah <= self.max_ayah.get(surah, 0):
+                return None
+            row = int(self.surah_offsets[surah]) + ayah - 1
+            ids = self.word_ids[self.ayah_offsets[row]:self.ayah_offsets[row + 1]]
+            id_list = ids.tolist()
+            entry = self.surahs[surah][ayah] = Ayah(
+                surah, ayah, self._text("raw", row),
+                [self.vocab.norms[i] for i in id_list], [self.vocab.skeletons[i] for i in id_list], ids,
+            )
+        return entry
+
+    def ayah_numbers(self, surah):
+        return list(range(1, self.max_ayah.get(surah, 0) + 1))
+
+    def iter_ayahs(self):
+        for surah in sorted(self.surahs):
+            for ayah in self.ayah_numbers(surah):
+                yield self.get(surah, ayah)
+
+    def surah_names(self):
+        """Surah names in the shape load_surah_names returns"""
+        return {
+            number: {"en": f"Surah {number}", "ar": self._text("name", i)}
+            for i, number in enumerate(self.arrays["name_number"].tolist())
+        }
+
+
+def ensure_corpus_cache(quran_path, names_path=None, cache_path=None):
+    """Path of an up-to-date cache of the text files, building it if needed; None if it cannot be"""
+    cache_path = cache_path or default_cache_path(quran_path)
+    try:
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                header, _ = _read_header(f.read(64 * 1024))
+            fresh = (header.get("version") == VERSION
+                     and header["quran_sha1"] == file_digest(quran_path)
+                     and (names_path is None or header["names_sha1"] == file_digest(names_path)))
+            if fresh:
+                return cache_path
+        return build_corpus_cache(quran_path, names_path, cache_path)
+    except Exception as e:
+        print(f"Corpus cache unavailable, reading the text instead: {e}")
+        return None
+
+
+def load_corpus(quran_path, names_path=None, cache_path=None):
+    """The corpus (and surah names, if names_path is given) from the binary cache.
+
+    Falls back to parsing the text files when the cache cannot be built or read.
+    """
+    path = ensure_corpus_cache(quran_path, names_path, cache_path)
+    if path is not None:
+        try:
+            corpus = MappedCorpus(path)
+            return corpus, corpus.surah_names() if names_path else {}
+        except Exception as e:
+            print(f"Error reading corpus cache {path}: {e}")
+    return load_quran(quran_path), load_surah_names(names_path) if names_path else {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the binary corpus cache")
+    parser.add_argument("quran", help="Quran text file (surah|ayah|text lines)")
+    parser.add_argument("names", nargs="?", help="Surah names file (number: name lines)")
+    parser.add_argument("--out", help="Cache file; defaults to the Quran file with a .hifz extension")
+    args = parser.parse_args(argv)
+
+    path = build_corpus_cache(args.quran, args.names, args.out)
+    print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+def _worker_main(model_path, sample_rate, requests, responses):
+    """Worker process: load the model once and decode the streams assigned to it"""
+    try:
+        from vosk import Model, KaldiRecognizer
+        model = Model(model_path)
+    except Exception as e:
+        # Reported to wait_ready instead of leaving the app waiting for a worker that is gone
+        responses.put((None, False, repr(e)))
+        return
+    recognizers = {}
+    responses.put((None, True, "ready"))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, stream_id, op, data = message
+        try:
+            if op == "accept":
+                rec = recognizers[stream_id]
+                final = rec.AcceptWaveform(data)
+                value = (final, rec.Result() if final else None, rec.PartialResult())
+            elif op == "open":
+                rec = KaldiRecognizer(model, sample_rate)
+                rec.SetWords(True)
+                recognizers[stream_id] = rec
+                value = None
+            elif op == "reset":
+                recognizers[stream_id].Reset()
+                value = None
+            elif op == "close":
+                recognizers.pop(stream_id, None)
+                value = None
+            else:
+                raise ValueError(f"Unknown decoder operation: {op}")
+            responses.put((request_id, True, value))
+        except Exception as e:
+            responses.put((request_id, False, repr(e)))
+
+
+class _Worker:
+    def __init__(self, ctx, model_path, sample_rate):
+        self.requests = ctx.Queue()
+        self.responses = ctx.Queue()
+        self.pending = {}
+        self.streams = 0
+        self.ready = threading.Event()
+        self.error = None  # Why the model could not be loaded
+        self.process = ctx.Process(target=_worker_main, daemon=True,
+                                   args=(model_path, sample_rate, self.requests, self.responses))
+        self.process.start()
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def _dispatch(self):
+        """Route replies from the worker to the callers waiting on them"""
+        while True:
+            reply = self.responses.get()
+            if reply is None:
+                break
+            request_id, ok, value = reply
+            if request_id is None:
+                if not ok:
+                    self.error = value
+                self.ready.set()
+                continue
+            future = self.pending.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(f"Decoder worker error: {value}"))
+
+    def wait_ready(self, timeout=None, poll=0.5):
+        """Block until the worker has loaded the model; raises if it failed, died or timed out"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready.wait(poll):
+            if not self.process.is_alive():
+                raise RuntimeError(f"Decoder worker exited (code {self.process.exitcode}) before loading the model")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise RuntimeError(f"Decoder worker did not load the model within {timeout}s")
+        if self.error is not None:
+            raise RuntimeError(f"Decoder worker could not load the model: {self.error}")
+
+
+class DecoderProcessPool:
+    """Decode audio in worker processes so recognition is not bound by one GIL.
+
+    Each worker loads the Vosk model once. A recognition stream is pinned to
+    the least busy worker when it is opened; audio chunks go to that worker
+    and only the JSON results come back.
+    """
+
+    def __init__(self, model_path, workers=2, sample_rate=16000, context=None, timeout=30.0):
+        ctx = context or multiprocessing.get_context()
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.workers = [_Worker(ctx, model_path, sample_rate) for _ in range(workers)]
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded the model; raises RuntimeError if one cannot"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self.workers:
+            worker.wait_ready(None if deadline is None else max(deadline - time.monotonic(), 0))
+
+    def _call(self, worker, stream_id, op, data=None):
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            worker.pending[request_id] = future
+        worker.requests.put((request_id, stream_id, op, data))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            worker.pending.pop(request_id, None)
+            state = "alive" if worker.process.is_alive() else "dead"
+            raise RuntimeError(f"Decoder worker ({state}) did not answer within {self.timeout}s")
+
+    def recognizer(self):
+        """Open a new stream on the least busy worker"""
+        with self._lock:
+            worker = min(self.workers, key=lambda w: w.streams)
+            worker.streams += 1
+            stream_id = next(self._ids)
+        self._call(worker, stream_id, "open")
+        return RemoteRecognizer(self, worker, stream_id)
+
+    def close(self):
+        for worker in self.workers:
+            worker.requests.put(None)
+            worker.responses.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+
+
+class RemoteRecognizer:
+    """KaldiRecognizer look-alike whose decoding happens in a worker process"""
+
+    def __init__(self, pool, worker, stream_id):
+        self.pool = pool
+        self.worker = worker
+        self.stream_id = stream_id
+        self._result = '{"text": ""}'
+        self._partial = '{"partial": ""}'
+
+    def AcceptWaveform(self, data):
+        # One round trip returns the final result (if any) and the partial
+        final, result, partial = self.pool._call(self.worker, self.stream_id, "accept", bytes(data))
+        if final:
+            self._result = result
+        self._partial = partial
+        return final
+
+    def Result(self):
+        return self._result
+
+    def PartialResult(self):
+        return self._partial
+
+    def Reset(self):
+        self.pool._call(self.worker, self.stream_id, "reset")
+        self._result = '{"text": ""}'
+        self._partial = '{"partial": ""}'
+
+    def close(self):
+        try:
+            self.pool._call(self.worker, self.stream_id, "close")
+        finally:
+            with self.pool._lock:
+                self.worker.streams -= 1
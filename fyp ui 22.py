@@ -1,465 +1,480 @@
 import gradio as gr
+import html
 import json
-from unicodedata import normalize
-import queue
+import os
 from vosk import Model, KaldiRecognizer
-import sounddevice as sd
-from fuzzywuzzy import fuzz
 import time
-from collections import defaultdict
-
-# Load Quran data
-def load_quran(file_path):
-    quran = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                parts = line.strip().split('|')
-                if len(parts) == 3:
-                    surah, ayah, text = parts
-                    surah = int(surah)
-                    ayah = int(ayah)
-                    if surah not in quran:
-                        quran[surah] = {}
-                    quran[surah][ayah] = text
-    except Exception as e:
-        print(f"Error loading Quran file: {e}")
-    return quran
-
-# Load Surah names from file
-def load_surah_names(file_path):
-    surah_names = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                parts = line.strip().split(':')
-                if len(parts) == 2:
-                    surah_num = int(parts[0].strip())
-                    surah_name = parts[1].strip()
-                    surah_names[surah_num] = {
-                        "en": f"Surah {surah_num}",
-                        "ar": surah_name
-                    }
-    except Exception as e:
-        print(f"Error loading surah names file: {e}")
-        # Fallback to default names if file can't be loaded
-        for i in range(1, 115):
-            surah_names[i] = {"en": f"Surah {i}", "ar": f"سورة {i}"}
-    return surah_names
-
-quran = load_quran("E:/FYP/quran-simple.txt")
-surah_names = load_surah_names("E:/FYP/surah_mapping_arabic.txt")
-model = Model("E:/FYP/vosk-model-ar-0.22-linto-1.1.0")
-rec = KaldiRecognizer(model, 16000)
-rec.SetWords(True)
-
-# Global State
-q = queue.Queue()
-state = {
-    "surah": 1,
-    "ayah": 1,
-    "buffer": "",
-    "running": False,
-    "recited_ayahs": {},
-    "stop_requested": False,
-    "current_attempt": {},
-    "partial_result": "",
-    "last_update": "",
-    "surah_content": "",
-    "errors": defaultdict(list),  # Track errors per ayah
-    "recited_text": defaultdict(str),  # Track what was actually recited
-    "expected_text": defaultdict(str)  # Track what was expected
-}
+import atexit
+from contextlib import nullcontext
+
+# Only needed when recording from a microphone on the server itself
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    sd = None
+
+from quran_corpus import WordSeq
+from corpus_cache import load_corpus
+from similarity import configure_caches, cache_stats
+from quran_index import RestartIndex, QuranLocator
+from aligner import StreamingAligner
+from sessions import SessionManager, SessionLimitError
+from audio_capture import SAMPLE_RATE, block_frames, to_pcm16
+from recognizer_pool import RecognizerPool
+from model_loader import BackgroundLoader
+from decoding import DecoderProcessPool
+from rendering import SurahView, get_template, APPLY_PATCH_JS
+from recitation import align_attempt, record_ayah, rewind, start_surah, generate_error_report
+from history import HistoryStore
+
+# Loaded by main(), mapped from the binary cache next to the text (built on
+# first start); decoder worker processes never need it
+quran = surah_names = None
+# Built in the background at start-up along with the model, see load_decoder
+restart_index = None
+locator = None
+model_path = "E:/FYP/vosk-model-ar-0.22-linto-1.1.0"
+
+# Where audio is decoded: "local" runs Vosk in this process, "process" runs it
+# in decoder_workers worker processes that each load the model once
+decoder_backend = os.environ.get("HIFZ_DECODER", "local")
+decoder_workers = int(os.environ.get("HIFZ_DECODER_WORKERS", os.cpu_count() or 2))
+# Seconds a decoder process may take to load the model before loading counts as failed
+decoder_load_timeout = float(os.environ.get("HIFZ_DECODER_LOAD_TIMEOUT", 600))
+
+# Each browser session recites with its own recognizer, audio queue and state;
+# the loaded model is shared. Recognizers come from a pool whose size caps how
+# many can recite at the same time; a few are built up front.
+max_concurrent_sessions = 30
+warm_recognizers = 4
+
+# Microphone capture: blocks of capture_block_ms (20-100 ms keeps highlighting
+# responsive) go into a per-session ring buffer holding at most
+# capture_buffer_ms of audio. If decoding falls further behind than that,
+# capture_overflow decides what is dropped: "drop_oldest" or "drop_newest".
+capture_block_ms = 50
+capture_buffer_ms = 10000
+capture_overflow = "drop_oldest"
+
+# Where recitations are heard: "server" records the microphone of the machine
+# running the app; "browser" streams each user's own microphone from their
+# browser, so a hosted app can serve many remote reciters
+audio_source = os.environ.get("HIFZ_AUDIO_SOURCE", "server")
+
+# Every recitation's per-word results are kept in this SQLite file, per
+# student, for progress over time; opened at start-up
+history_path = os.environ.get("HIFZ_HISTORY", "E:/FYP/recitation_history.sqlite3")
+history = None
+
+# Sessions get their recognizer pool once the model has loaded
+sessions = SessionManager(buffer_options={
+    "capacity_ms": capture_buffer_ms,
+    "block_ms": capture_block_ms,
+    "overflow": capture_overflow,
+})
+
+def load_decoder(report):
+    """Build the Quran search indexes, load the acoustic model in the chosen
+    backend and warm up the recognizer pool, reporting progress as it goes.
+
+    Runs in the background at start-up so the app is usable straight away;
+    only starting a recitation waits for it.
+    """
+    global restart_index, locator
+    report(0.0, "Indexing the Quran")
+    restart_index = RestartIndex(quran)
+    locator = QuranLocator(quran)
+    
+    if decoder_backend == "process":
+        report(0.1, "Starting decoder processes")
+        decoder = DecoderProcessPool(model_path, workers=decoder_workers)
+        deadline = time.monotonic() + decoder_load_timeout
+        for i, worker in enumerate(decoder.workers, 1):
+            try:
+                # Raises if the worker fails, dies or times out, so the loader reports the failure
+                worker.wait_ready(max(deadline - time.monotonic(), 0))
+            except RuntimeError:
+                decoder.close()
+                raise
+            report(0.1 + 0.8 * i / len(decoder.workers), f"Decoder processes ready {i}/{len(decoder.workers)}")
+        make_recognizer = decoder.recognizer
+    else:
+        report(0.1, "Loading the acoustic model")
+        model = Model(model_path)
+        
+        def make_recognizer():
+            rec = KaldiRecognizer(model, 16000)
+            rec.SetWords(True)
+            return rec
+    
+    pool = RecognizerPool(make_recognizer, size=max_concurrent_sessions, warm=0)
+    for i in range(warm_recognizers):
+        report(0.9 + 0.1 * i / warm_recognizers, f"Warming recognizers {i + 1}/{warm_recognizers}")
+        pool.prewarm(1)
+    sessions.pool = pool
+    return pool
+
+decoder_loader = BackgroundLoader(load_decoder, name="decoder-loader")
+
+def loading_display():
+    """Progress of the model loading, shown while a recitation waits for it"""
+    progress = decoder_loader.progress()
+    if progress["error"]:
+        return f"<div class='error'>The speech model could not be loaded: {decoder_loader.error}</div>"
+    return f"""
+    <div class='model-loading'>
+        <p>Preparing the speech model: {progress['message']}</p>
+        <progress value="{progress['fraction']:.2f}" max="1"></progress>
+    </div>
+    """
 
 accuracy_threshold = 67 # Increased threshold for better accuracy
+locate_max_words = 12 # A free recitation is located from at most this many recent words
 
-def get_ayah(surah, ayah):
-    return quran.get(surah, {}).get(ayah, "")
+# Ayahs shown either side of the one being recited; the rest of the surah is
+# collapsed. None shows every ayah of the surah.
+display_window = 10
 
-def audio_callback(indata, frames, time, status):
-    if status:
-        print(status)
-    q.put(bytes(indata))
+# Display updates go out as soon as there is something new, but no more often
+# than ui_min_interval; while decoding is behind the interval backs off
+# towards ui_max_interval. Finished ayahs are always shown straight away.
+ui_min_interval = 0.05
+ui_max_interval = 0.5
 
-def normalize_arabic(text):
-    """Normalize Arabic text to standard form and group similar diacritics"""
-    text = normalize('NFC', text)  # Normalize to composed form
-    
-    # Define groups of similar diacritics that should be considered equivalent
-    similar_diacritics = {
-        'َ': ['ً'],  # Fatha and Fathatan are similar
-        'ِ': ['ٍ'],  # Kasra and Kasratan are similar
-        'ُ': ['ٌ'],  # Damma and Dammatan are similar
-        'ْ': [],     # Sukun
-        'ّ': [],    # Shadda
-        'َ': 'ا',  # Fatha (Zabr) → Alif
-        'ً': 'ا',  # Fathatan → Alif
-        'ا': 'ا',  # Alif remains Alif
-    }
-    
-    # Replace similar diacritics with their base form
-    replacements = {}
-    for base, equivalents in similar_diacritics.items():
-        for equiv in equivalents:
-            replacements[equiv] = base
-    
-    # Apply the replacements
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    
-    # Remove tatweel (elongation character)
-    text = text.replace('ـ', '')
-    
-    return text
+# Process-wide caches of word normalizations and word-pair scores, shared by all recitations
+configure_caches(pair_size=200000, normalize_size=50000, id_pair_size=200000)
 
-def calculate_similarity(expected, recited):
-    """Improved similarity calculation for Arabic with diacritics"""
-    # Normalize both texts (this will now group similar diacritics)
-    expected_norm = normalize_arabic(expected)
-    recited_norm = normalize_arabic(recited)
-    
-    # If they match exactly after normalization
-    if expected_norm == recited_norm:
-        return 100
-    
-    # Calculate base similarity (without any diacritics)
-    expected_base = ''.join([c for c in expected_norm if not (0x64B <= ord(c) <= 0x652)])
-    recited_base = ''.join([c for c in recited_norm if not (0x64B <= ord(c) <= 0x652)])
-    
-    # If base letters don't match, return regular similarity
-    if expected_base != recited_base:
-        return fuzz.ratio(expected_norm, recited_norm)
-    
-    # If base letters match, be more lenient with diacritics
-    base_similarity = 80  # High base score since letters match
-    diacritic_similarity = fuzz.ratio(expected_norm, recited_norm)
-    
-    # Weighted average favoring base letters
-    return int(base_similarity * 0.7 + diacritic_similarity * 0.3)
-def highlight_words(expected, recited, accuracy_threshold=accuracy_threshold, current_word_index=None):
-    expected_words = expected.split()
-    recited_words = recited.split()
-
-    highlighted = []
-    accuracy_count = 0
-    error_details = []
+def get_ayah(surah, ayah):
+    return quran.get_ayah(surah, ayah)
+
+def locate_recitation(state, partial_text):
+    """Try to find where a free recitation started; returns (aligner, events) once found"""
+    # Only the last locate_max_words finalized words are kept, so each tick costs the same
+    del state["locate_words"][:-locate_max_words]
+    finals = WordSeq.from_text(" ".join(state["locate_words"]))
+    query = WordSeq.from_text(" ".join(state["locate_words"] + partial_text.split()[:locate_max_words - len(state["locate_words"])]))
+    match = locator.locate(query, max_words=locate_max_words, accuracy_threshold=accuracy_threshold)
+    if not match:
+        return None, []
     
-    for i, e in enumerate(expected_words):
-        # Default to uncolored text
-        word_style = ""
-        
-        # Only apply coloring if we have recited words to compare
-        if i < len(recited_words):
-            r = recited_words[i]
-            similarity = calculate_similarity(e, r)
-            if similarity >= accuracy_threshold:
-                word_style = "color: green;"
-                accuracy_count += 1
-            else:
-                word_style = "color: red;"
-                error_details.append({
-                    "position": i,
-                    "expected": e,
-                    "recited": r,
-                    "similarity": similarity
-                })
-        
-        # Always apply underline to current word
-        if current_word_index is not None and i == current_word_index:
-            word_style += " border-bottom: 2px solid #0c4b33;"
-        
-        if word_style:
-            highlighted.append(f"<span style='{word_style}'>{e}</span>")
-        else:
-            highlighted.append(e)
-
-    return " ".join(highlighted), accuracy_count, error_details
-
-def recognize_generator(surah_num):
-    state.update({
-        "surah": int(surah_num),
-        "ayah": 1,
-        "buffer": "",
-        "running": True,
-        "recited_ayahs": {},
-        "stop_requested": False,
-        "current_attempt": {},
-        "partial_result": "",
-        "last_update": "",
-        "surah_content": "",
-        "errors": defaultdict(list),
-        "recited_text": defaultdict(str),
-        "expected_text": defaultdict(str),
-        "completed_surahs": [],  # Track completed surahs
-        "partial_ayah_buffer": ""  # New buffer to track partial ayah recitation
-    })
-
-    # Initial display with first word highlighted
-    initial_display = display_surah_content(state["surah"], show_title=False, highlight_current_word=0)
-    state["last_update"] = initial_display
-    yield initial_display
+    aligner = StreamingAligner(quran, match["surah"], match["ayah"], accuracy_threshold=accuracy_threshold,
+                               restart_index=restart_index, skip_words=match["skip_words"])
+    # Words already heard are replayed so the tracking loop picks up from here
+    return aligner, aligner.accept_final(finals)
+
+def page(html):
+    """Generator output replacing the whole display"""
+    return html, gr.update()
+
+def patch(ayahs, seq):
+    """Generator output changing only some ayah elements of the display"""
+    return gr.update(), {"seq": seq, "ayahs": ayahs}
+
+def recitation_display(state):
+    """The surah being recited with all its highlighting, plus the latest surah report"""
+    full_surah_html = surah_content_panel(state["view"].html())
+    if not state["completed_surahs"]:
+        return full_surah_html
+    report = state["completed_surahs"][-1]  # Get the most recent report
+    return f"""
+    <div class='current-recitation'>
+        {full_surah_html}
+    </div>
+    <div class='completed-surah-report'>
+        <h3>Completed Surah {report['surah_num']} Report</h3>
+        {report['report']}
+    </div>
+    """
 
+def recognize_generator(surah_num, student, request: gr.Request):
+    # Surah 0 means "recite from anywhere": listen first, then locate
+    locating = not surah_num
+    student = (student or "").strip() or "guest"
+    # Only a recitation started before the model has loaded waits for it
+    while not decoder_loader.done:
+        yield page(loading_display())
+        decoder_loader.wait(0.5)
+    if decoder_loader.error is not None:
+        yield page(loading_display())
+        return
     try:
-        with sd.RawInputStream(samplerate=16000, blocksize=8000, dtype='int16',
-                             channels=1, callback=audio_callback):
+        session, state = sessions.start(request.session_hash, int(surah_num or 1))
+    except SessionLimitError as e:
+        yield page(f"<div class='error'>{e}</div>")
+        return
+    audio, rec, metrics = state["audio"], state["recognizer"], session.metrics
+    recitation_id = None
+
+    # From here on the recognizer is this recitation's until the finally below returns it
+    try:
+        if not locating:
+            state["aligner"] = StreamingAligner(quran, int(surah_num), accuracy_threshold=accuracy_threshold,
+                                                restart_index=restart_index)
+            state["view"] = SurahView(get_template(quran, state["surah"]), window=display_window)
+        aligner = state["aligner"]
+        recitation_id = history.start_recitation(student, request.session_hash, int(surah_num or 0) or None) if history else None
+
+        # Initial display with first word highlighted
+        if locating:
+            initial_display = locate_message()
+        else:
+            initial_display = surah_content_panel(state["view"].html())
+        state["last_update"] = initial_display
+        yield page(initial_display)
+        
+        # The page the browser holds, and the patches sent since it was sent whole
+        shown_view, shown_report = state["view"], None
+        patch_seq = 0
+        ui_interval = ui_min_interval
+        last_sent = time.perf_counter()
+        last_partial = None  # Partial the current highlighting was built from
+
+        with open_capture(audio):
             while state["running"]:
-                data = q.get()
+                # Wakes as soon as audio arrives; a backlog is decoded in one step
+                waited_since = time.perf_counter()
+                data, chunks = audio.read()
+                if data is None:
+                    # Replaced by a newer recitation in this session
+                    break
+                tick = metrics.tick(waited_since)
+                metrics.observe("backlog_ms", len(data) / (2 * SAMPLE_RATE) * 1000)
+                if chunks > 1:
+                    ui_interval = min(ui_interval * 2, ui_max_interval)
+                else:
+                    ui_interval = max(ui_interval / 2, ui_min_interval)
                 
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    text = result.get("text", "").strip()
-                    if text:
-                        state["buffer"] += " " + text
-                        state["buffer"] = state["buffer"].strip()
+                final = rec.AcceptWaveform(data)
+                tick.lap("decode")
+                # Right after a final result the partial is empty, so it is not fetched
+                if final:
+                    text = json.loads(rec.Result()).get("text", "").strip()
+                    partial_text = ""
+                else:
+                    text = ""
+                    partial_text = json.loads(rec.PartialResult()).get("partial", "").strip()
+                tick.lap("parse")
                 
-                # Process partial results
-                partial_result = json.loads(rec.PartialResult())
-                partial_text = partial_result.get("partial", "").strip()
+                events = []
+                if text:
+                    if aligner is None:
+                        state["locate_words"].extend(text.split())
+                    else:
+                        # Only the newly finalized words are aligned (and checked for jumps back)
+                        events = aligner.accept_final(WordSeq.from_text(text))
+                    state["partial_result"] = ""
                 
+                # Process partial results
                 if partial_text:
                     state["partial_result"] = partial_text
-                    partial_words = partial_text.split()
-                    remaining_buffer = partial_words.copy()
-                    current_attempt = {}
-                    
-                    ayah_num = state["ayah"]
-                    ayah_text = get_ayah(state["surah"], ayah_num)
-                    
-                    # Combine with any previously partially recited words
-                    if state["partial_ayah_buffer"]:
-                        partial_words = (state["partial_ayah_buffer"] + " " + partial_text).split()
-                        remaining_buffer = partial_words.copy()
-                    
-                    while ayah_text and remaining_buffer:
-                        ayah_words = ayah_text.split()
-                        ayah_part = remaining_buffer[:len(ayah_words)]
-                        remaining_buffer = remaining_buffer[len(ayah_words):]
-                        
-                        # Calculate current word position
-                        current_word_pos = len(ayah_part) - 1 if ayah_part else 0
-                        
-                        highlighted, _, _ = highlight_words(ayah_text, " ".join(ayah_part), 
-                                               current_word_index=current_word_pos)
-                        
-                        current_attempt[ayah_num] = {
-                            "text": " ".join(ayah_part),
-                            "highlighted": highlighted,
-                            "current_word_pos": current_word_pos
-                        }
-                        
-                        ayah_num += 1
-                        ayah_text = get_ayah(state["surah"], ayah_num)
-                    
-                    state["current_attempt"] = current_attempt
+                tick.lap("align")
                 
-                # Check for backward jumps
-                buffer_words = state["buffer"].split()
-                backward_jump_detected = False
-                
-                for previous_ayah in range(1, state["ayah"]):
-                    prev_text = get_ayah(state["surah"], previous_ayah)
-                    if not prev_text:
+                if aligner is None:
+                    aligner, events = locate_recitation(state, state["partial_result"])
+                    tick.lap("locate")
+                    if aligner is None:
+                        tick.done()
                         continue
-                        
-                    prev_words = prev_text.split()
-                    if len(buffer_words) < len(prev_words):
-                        continue
-                        
-                    test_sample = buffer_words[:len(prev_words)]
-                    match_score = sum(calculate_similarity(e, r) >= accuracy_threshold 
-                                    for e, r in zip(prev_words, test_sample)) / len(prev_words) * 100
+                    state["aligner"] = aligner
+                    state["surah"] = aligner.surah
+                    state["view"] = SurahView(get_template(quran, aligner.surah), window=display_window)
+                    last_partial = None
+                
+                view = state["view"]
+                
+                for event in events:
+                    if event["type"] == "jump":
+                        # Drop everything recited after the ayah the reciter went back to
+                        rewind(state, event["ayah"])
+                        view.forget_recited([ayah_num for ayah_num in view.recited if ayah_num >= event["ayah"]])
                     
-                    if match_score >= accuracy_threshold:
-                        if previous_ayah == state["ayah"] - 1:
-                            if state["ayah"] in state["recited_ayahs"]:
-                                del state["recited_ayahs"][state["ayah"]]
-                        else:
-                            state["recited_ayahs"] = {
-                                ayah_num: highlight 
-                                for ayah_num, highlight in state["recited_ayahs"].items() 
-                                if ayah_num <= previous_ayah
-                            }
-                            state["ayah"] = previous_ayah + 1
-                        
-                        buffer_words = buffer_words[len(prev_words):]
-                        state["buffer"] = ' '.join(buffer_words).strip()
-                        state["partial_ayah_buffer"] = ""  # Clear partial buffer on backward jump
-                        backward_jump_detected = True
-                        state["partial_result"] = ""
-                        state["current_attempt"] = {}
-                        break
-
-                if not backward_jump_detected:
-                    buffer_words = state["buffer"].split()
-                    ayah_num = state["ayah"]
-                    ayah_text = get_ayah(state["surah"], ayah_num)
-                    surah_completed = False
+                    elif event["type"] == "ayah":
+                        ayah = quran.get(event["surah"], event["ayah"])
+                        highlighted, correct, _ = record_ayah(state, ayah, event, accuracy_threshold)
+                        view.set_recited(event["ayah"], highlighted)
+                        if history:
+                            history.record_ayah(recitation_id, event["surah"], event["ayah"], event["scores"],
+                                                event["recited"].words, ayah.word_count, correct)
                     
-                    while ayah_text and len(buffer_words) >= len(ayah_text.split()):
-                        ayah_words = ayah_text.split()
-                        recited_part = buffer_words[:len(ayah_words)]
-                        buffer_words = buffer_words[len(ayah_words):]
+                    elif event["type"] == "surah_complete":
+                        current_surah = event["surah"]
+                        next_surah = event["next_surah"]
                         
-                        accuracy = sum(calculate_similarity(e, r) >= accuracy_threshold 
-                                 for e, r in zip(ayah_words, recited_part)) / len(ayah_words) * 100
+                        # Generate error report for completed surah
+                        error_report = generate_error_report(state)
                         
-                        if accuracy >= 50:
-                            highlighted, _, error_details = highlight_words(ayah_text, " ".join(recited_part))
-                            state["recited_ayahs"][ayah_num] = highlighted
-                            state["buffer"] = " ".join(buffer_words)
-                            state["partial_ayah_buffer"] = ""  # Clear partial buffer on successful ayah completion
-                            
-                            # Store error details
-                            state["errors"][ayah_num].extend(error_details)
-                            state["recited_text"][ayah_num] = " ".join(recited_part)
-                            state["expected_text"][ayah_num] = ayah_text
-                            
-                            ayah_num += 1
-                            
-                            # Check for surah completion
-                            if ayah_num > max(quran.get(state["surah"], {}).keys()):
-                                surah_completed = True
-                                current_surah = state["surah"]
-                                next_surah = current_surah + 1
-                                
-                                # Generate error report for completed surah
-                                error_report = generate_error_report()
-                                
-                                # Keep only the most recent report
-                                state["completed_surahs"] = [{
-                                    "surah_num": current_surah,
-                                    "report": error_report
-                                }]
-                                
-                                if next_surah in quran:
-                                    # Reset state for next surah
-                                    state["surah"] = next_surah
-                                    ayah_num = 1
-                                    state["recited_ayahs"] = {}
-                                    state["buffer"] = ""
-                                    state["current_attempt"] = {}
-                                    state["partial_result"] = ""
-                                    state["errors"] = defaultdict(list)
-                                    state["recited_text"] = defaultdict(str)
-                                    state["expected_text"] = defaultdict(str)
-                                    state["partial_ayah_buffer"] = ""
-                                    
-                                    # Display new surah first, then the error report below
-                                    full_surah_html = display_surah_content(next_surah, show_title=False, highlight_current_word=0)
-                                    combined_html = f"""
-                                    <div class='new-surah-display'>
-                                        <h3>Now Reciting: Surah {next_surah}</h3>
-                                        {full_surah_html}
-                                    </div>
-                                    <div class='completed-surah-report'>
-                                        <h3>Completed Surah {current_surah} Report</h3>
-                                        {error_report}
-                                    </div>
-                                    """
-                                    state["last_update"] = combined_html
-                                    yield combined_html
-                                    continue
-                                else:
-                                    state["running"] = False
-                    
-                    state["ayah"] = ayah_num
-                    
-                    # Handle partial ayah recitation (new logic)
-                    if ayah_text and buffer_words:
-                        ayah_words = ayah_text.split()
-                        partial_match = False
+                        # Keep only the most recent report
+                        state["completed_surahs"] = [{
+                            "surah_num": current_surah,
+                            "report": error_report
+                        }]
                         
-                        # Check if we have a partial match at the beginning of the ayah
-                        if len(buffer_words) <= len(ayah_words):
-                            partial_accuracy = sum(calculate_similarity(e, r) >= accuracy_threshold 
-                                                for e, r in zip(ayah_words[:len(buffer_words)], buffer_words)) / len(buffer_words) * 100
-                            
-                            if partial_accuracy >= 50:
-                                state["partial_ayah_buffer"] = " ".join(buffer_words)
-                                partial_match = True
-                        
-                        if not partial_match:
-                            state["partial_ayah_buffer"] = ""
-                    
-                    # If surah was completed but we're not moving to next surah (end of Quran)
-                    if surah_completed and not state["running"]:
-                        error_report = generate_error_report()
-                        final_html = f"""
-                        <div class='final-report'>
-                            <h2>Recitation Complete</h2>
-                            <div class='final-surah-report'>
-                                {error_report}
+                        if next_surah is None:
+                            # End of the Quran
+                            state["running"] = False
+                            final_html = f"""
+                            <div class='final-report'>
+                                <h2>Recitation Complete</h2>
+                                <div class='final-surah-report'>
+                                    {error_report}
+                                </div>
                             </div>
+                            """
+                            state["last_update"] = final_html
+                            yield page(final_html)
+                            return
+                        
+                        # Reset state for next surah
+                        start_surah(state, next_surah)
+                        view = state["view"] = SurahView(get_template(quran, next_surah), window=display_window)
+                        
+                        # Display new surah first, then the error report below
+                        full_surah_html = display_surah_content(next_surah, show_title=False, highlight_current_word=0)
+                        combined_html = f"""
+                        <div class='new-surah-display'>
+                            <h3>Now Reciting: Surah {next_surah}</h3>
+                            {full_surah_html}
+                        </div>
+                        <div class='completed-surah-report'>
+                            <h3>Completed Surah {current_surah} Report</h3>
+                            {error_report}
                         </div>
                         """
-                        state["last_update"] = final_html
-                        yield final_html
-                        return
-                
-                # Build display
-                full_surah_html = display_surah_content(
-                    state["surah"], 
-                    show_title=False,
-                    highlight_current_word=state["ayah"] if not state["current_attempt"] else None
-                )
+                        state["last_update"] = combined_html
+                        yield page(combined_html)
                 
-                # Apply highlighting to completed ayahs
-                for ayah_num, highlighted in state["recited_ayahs"].items():
-                    ayah_text = get_ayah(state["surah"], ayah_num)
-                    ayah_html = f"{highlighted}<sup style='font-size:0.7em;'>۝</sup>"
-                    full_surah_html = full_surah_html.replace(
-                        f"{ayah_text}<sup style='font-size:0.7em;'>۝</sup>",
-                        ayah_html
-                    )
-                
-                # Apply real-time highlighting with underlines
-                for ayah_num, attempt in state["current_attempt"].items():
-                    ayah_text = get_ayah(state["surah"], ayah_num)
-                    if ayah_text:
-                        # Highlight the current word being recited
-                        ayah_html = f"{attempt['highlighted']}<sup style='font-size:0.7em;'>۝</sup>"
-                        full_surah_html = full_surah_html.replace(
-                            f"{ayah_text}<sup style='font-size:0.7em;'>۝</sup>",
-                            ayah_html
-                        )
-                
-                # Add completed surah report if it exists
-                current_display = full_surah_html
-                if state["completed_surahs"]:
-                    report = state["completed_surahs"][-1]  # Get the most recent report
-                    current_display = f"""
-                    <div class='current-recitation'>
-                        {full_surah_html}
-                    </div>
-                    <div class='completed-surah-report'>
-                        <h3>Completed Surah {report['surah_num']} Report</h3>
-                        {report['report']}
-                    </div>
-                    """
+                state["surah"] = aligner.surah
+                state["ayah"] = aligner.ayah
+                tick.lap("events")
                 
-                if current_display != state["last_update"] and not state["stop_requested"]:
-                    state["last_update"] = current_display
-                    yield current_display
+                # Nothing new was heard (a pause or a held vowel): the highlighting stands
+                moved = False
+                if text or state["partial_result"] != last_partial:
+                    last_partial = state["partial_result"]
+                    
+                    # Lay the finalized words of the current ayah plus the partial over the text
+                    current_attempt = align_attempt(quran, aligner, state["partial_result"], accuracy_threshold)
+                    state["current_attempt"] = current_attempt
+                    tick.lap("highlight")
+                    
+                    # Build display: only the slots of ayahs that changed are re-rendered
+                    view.set_attempt({ayah_num: attempt["highlighted"] for ayah_num, attempt in current_attempt.items()})
+                    view.set_cursor(state["ayah"] if not current_attempt else None)
+                    
+                    # The window follows the reciter forward and back
+                    moved = view.follow(state["ayah"])
+                    tick.lap("view")
                 
-                # Short sleep to prevent overwhelming the UI
-                time.sleep(0.1)
+                # A new surah, report or window resends the page; otherwise only the changed ayahs go out
+                report = state["completed_surahs"][-1] if state["completed_surahs"] else None
+                if state["stop_requested"]:
+                    # The stop report has taken over the display
+                    pass
+                elif moved or view is not shown_view or report is not shown_report:
+                    view.take_patch()
+                    shown_view, shown_report = view, report
+                    state["last_update"] = recitation_display(state)
+                    last_sent = time.perf_counter()
+                    tick.lap("render")
+                    yield page(state["last_update"])
+                    tick.lap("transport")
+                elif events or time.perf_counter() - last_sent >= ui_interval:
+                    # Changes made in between are held by the view until sent
+                    changed = view.take_patch()
+                    if changed:
+                        patch_seq += 1
+                        state["last_update"] = None  # Built again from the view when needed
+                        last_sent = time.perf_counter()
+                        tick.lap("render")
+                        yield patch(changed, patch_seq)
+                        tick.lap("transport")
+                tick.done()
                 
     except Exception as e:
-        yield f"<div class='error'>Error: {e}</div>"
+        yield page(f"<div class='error'>Error: {e}</div>")
+    finally:
+        sessions.finish(session, state)
+        if recitation_id is not None:
+            history.finish_recitation(recitation_id)
     
     # After stopping, don't yield anything else
     if state["stop_requested"]:
-        yield state["last_update"]
+        yield page(state["last_update"])
+
+def open_capture(audio):
+    """Start filling the session's audio buffer from the server microphone.
+
+    Browser audio arrives through receive_audio instead, so there is
+    nothing to open for it.
+    """
+    if audio_source == "browser":
+        return nullcontext()
+    if sd is None:
+        raise RuntimeError("sounddevice is not installed; set HIFZ_AUDIO_SOURCE=browser to use the browser microphone")
+    return sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=block_frames(capture_block_ms), dtype='int16',
+                             channels=1, latency='low', callback=audio.callback)
+
+def receive_audio(chunk, request: gr.Request):
+    """Feed a chunk streamed from the browser microphone into the session's recitation"""
+    if chunk is None:
+        return
+    sample_rate, samples = chunk
+    session = sessions.get(request.session_hash)
+    with session.input_lock:
+        session.audio.write(to_pcm16(samples, sample_rate, resampler=session.resampler_for(sample_rate)))
+
+def progress_report(student, days=30):
+    """The student's weakest ayahs and summary over the last days, as HTML"""
+    student = (student or "").strip() or "guest"
+    if history is None:
+        return "<p>Recitation history is not enabled.</p>"
+    summary = history.student_summary(student, days)
+    if not summary["ayahs"]:
+        return f"<p>No recitations by {html.escape(student)} in the last {days} days.</p>"
+    rows = "".join(
+        f"<tr><td>{surah_names.get(row['surah'], {}).get('ar', row['surah'])}</td><td>{row['ayah']}</td>"
+        f"<td>{row['attempts']}</td><td>{row['errors']}</td><td>{row['accuracy']:.0f}%</td></tr>"
+        for row in history.weakest_ayahs(student, days)
+    )
+    return f"""
+    <div class='progress-report'>
+        <p>{summary['recitations']} recitations, {summary['ayahs']} ayahs, {summary['accuracy']:.0f}% of words correct
+        in the last {days} days</p>
+        <h4>Ayahs to revise</h4>
+        <table>
+            <thead>
+                <tr><th>Surah</th><th>Ayah</th><th>Attempts</th><th>Errors</th><th>Accuracy</th></tr>
+            </thead>
+            <tbody>{rows}</tbody>
+        </table>
+    </div>
+    """
 
-def stop_recitation():
+def metrics_report():
+    """Per-stage timings of every session plus the shared pools and caches, for the debug panel"""
+    report = sessions.metrics()
+    report["model"] = decoder_loader.progress()
+    report["recognizer_pool"] = sessions.pool.stats() if sessions.pool else None
+    report["caches"] = cache_stats()
+    report["caches"]["vocabulary"] = quran.vocab.stats()
+    report["history"] = history.stats() if history else None
+    return report
+
+def stop_recitation(request: gr.Request):
+    session = sessions.get(request.session_hash)
+    state = session.state
     state["running"] = False
     state["stop_requested"] = True
+    # Wakes the recognition loop if it is waiting for audio, so it ends now
+    session.audio.close()
     
     # Generate error report
-    error_report = generate_error_report()
+    error_report = generate_error_report(state)
     
     # Get the current display without any further updates
     current_display = state["last_update"]
+    if current_display is None:
+        current_display = recitation_display(state)
     
     # Combine with the error report in a way that won't be overwritten
     full_report = f"""
@@ -479,125 +494,15 @@ def stop_recitation():
     
     return full_report
 
-def generate_error_report():
-    if not state["errors"]:
-        return "<p class='success-message'>Excellent recitation! No errors detected.</p>"
-    
-    report_html = []
-    total_errors = 0
-    
-    for ayah_num in sorted(state["errors"].keys()):
-        errors = state["errors"][ayah_num]
-        if not errors:
-            continue
-            
-        total_errors += len(errors)
-        expected_text = state["expected_text"][ayah_num]  # Original with full diacritics
-        recited_text = state["recited_text"][ayah_num]    # What was actually recited
-        
-        # Create a detailed comparison with full diacritics
-        comparison_html = []
-        expected_words = expected_text.split()
-        recited_words = recited_text.split()
-        
-        for i, expected_word in enumerate(expected_words):
-            error_found = False
-            for error in errors:
-                if error["position"] == i:
-                    # Get the actual recited word with harakat if available
-                    recited_word_with_harakat = ""
-                    if i < len(recited_words):
-                        # Try to preserve harakat from original text where possible
-                        original_word = expected_words[i]
-                        recited_word = recited_words[i]
-                        
-                        # Create a hybrid word that shows the recited letters with original harakat
-                        hybrid_word = []
-                        original_chars = list(original_word)
-                        recited_chars = list(recited_word)
-                        
-                        for oc in original_chars:
-                            if oc in ['َ', 'ِ', 'ُ', 'ً', 'ٍ', 'ٌ', 'ْ', 'ّ']:
-                                hybrid_word.append(oc)
-                            elif recited_chars:
-                                hybrid_word.append(recited_chars.pop(0))
-                        
-                        # Add any remaining recited characters
-                        hybrid_word.extend(recited_chars)
-                        recited_word_with_harakat = ''.join(hybrid_word)
-                    else:
-                        recited_word_with_harakat = "[Missing]"
-                    
-                    comparison_html.append(
-                        f"<tr>"
-                        f"<td class='expected-word'>{expected_word}</td>"
-                        f"<td class='recited-word error-word'>{recited_word_with_harakat}</td>"
-                        f"<td class='similarity'>{error['similarity']}%</td>"
-                        f"</tr>"
-                    )
-                    error_found = True
-                    break
-            
-            if not error_found:
-                if i < len(recited_words):
-                    # For correct words, show the original harakat
-                    comparison_html.append(
-                        f"<tr>"
-                        f"<td class='expected-word'>{expected_word}</td>"
-                        f"<td class='recited-word correct-word'>{expected_words[i]}</td>"
-                        f"<td class='similarity'>100%</td>"
-                        f"</tr>"
-                    )
-                else:
-                    comparison_html.append(
-                        f"<tr>"
-                        f"<td class='expected-word'>{expected_word}</td>"
-                        f"<td class='recited-word missing-word'>[Missing]</td>"
-                        f"<td class='similarity'>0%</td>"
-                        f"</tr>"
-                    )
-        
-        report_html.append(f"""
-        <div class='ayah-error-report'>
-            <h4>Ayah {ayah_num} Errors ({len(errors)} errors)</h4>
-            <div class='comparison-table'>
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Expected</th>
-                            <th>Your Recitation</th>
-                            <th>Similarity</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {"".join(comparison_html)}
-                    </tbody>
-                </table>
-            </div>
-        </div>
-        """)
-
-    return "".join(report_html)
-
 def display_surah_content(surah_num, show_title=True, highlight_current_word=None):
     if not surah_num:
         return ""
 
-    ayah_list = []
-    for ayah_num in sorted(quran.get(surah_num, {}).keys()):
-        ayah_text = get_ayah(surah_num, ayah_num)
-        
-        # Highlight current word if specified
-        if highlight_current_word is not None and ayah_num == highlight_current_word:
-            words = ayah_text.split()
-            if words:
-                words[0] = f"<span class='current-word-highlight'>{words[0]}</span>"
-                ayah_text = " ".join(words)
-        
-        ayah_html = f"{ayah_text}<sup style='font-size:0.7em;'>۝</sup>"
-        ayah_list.append(ayah_html)
-
-    surah_content = " ".join(ayah_list)
+    # Pre-rendered once per surah; the current word highlight only swaps one ayah
+    view = SurahView(get_template(quran, surah_num), window=display_window)
+    view.set_cursor(highlight_current_word)
+    view.follow(highlight_current_word)
+    surah_content = view.html()
     
     if show_title:
         surah_name_ar = surah_names.get(surah_num, {}).get("ar", f"سورة {surah_num}")
@@ -613,12 +518,27 @@ def display_surah_content(surah_num, show_title=True, highlight_current_word=Non
         </div>
         """
     else:
-        return f"""
+        return surah_content_panel(surah_content)
+
+def surah_content_panel(surah_content):
+    return f"""
         <div class='surah-content'>
             {surah_content}
         </div>
         """
 
+def locate_message():
+    return """
+    <div class='surah-content'>
+        <p class='locate-message'>Start reciting from any ayah, listening...</p>
+    </div>
+    """
+
+def show_selected_surah(surah_num):
+    if not surah_num:
+        return locate_message()
+    return display_surah_content(surah_num, show_title=False, highlight_current_word=1)
+
 def filter_surahs(search_term):
     if not search_term:
         return [gr.update(visible=True) for _ in range(114)]
@@ -629,7 +549,8 @@ def filter_surahs(search_term):
     except ValueError:
         return [gr.update(visible=True) for _ in range(114)]
 
-with gr.Blocks(css="""
+# Stylesheet of the whole app
+app_css = """
 .header {
     background: linear-gradient(135deg, #0c4b33 0%, #1a936f 100%);
     padding: 1.8rem 1.5rem;
@@ -767,6 +688,22 @@ with gr.Blocks(css="""
     color: rgba(12, 75, 51, 0.5);
 }
 
+/* Free Recitation Button */
+.locate-button {
+    max-width: 300px;
+    margin: -1.5rem auto 1rem !important;
+    background: linear-gradient(135deg, #0c4b33 0%, #1a936f 100%) !important;
+    color: white !important;
+    border-radius: 50px !important;
+    border: none !important;
+}
+
+.locate-message {
+    text-align: center;
+    color: #0c4b33;
+    opacity: 0.8;
+}
+
 /* Surah Grid with Islamic Motif */
 .surah-grid {
     display: grid;
@@ -954,6 +891,27 @@ with gr.Blocks(css="""
         0 6px 12px rgba(0,0,0,0.05);
 }
 
+/* Collapsed ayahs outside the display window */
+.ayah-gap {
+    font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
+    font-size: 1rem;
+    color: #7a9c8e;
+    padding: 0 0.5rem;
+    white-space: nowrap;
+}
+
+/* Speech model start-up progress */
+.model-status, .model-loading {
+    font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
+    color: #7a9c8e;
+    text-align: center;
+}
+
+.model-status progress, .model-loading progress {
+    width: 60%;
+    accent-color: #7a9c8e;
+}
+
 /* Current Word Highlight Style */
 .current-word-highlight {
     background-color: black !important;
@@ -1389,82 +1347,163 @@ with gr.Blocks(css="""
         font-size: 1.2rem;
     }
 }
-""") as app:
+"""
+
+def build_ui():
+    """The Gradio app; only built in the main process, see main()"""
+    with gr.Blocks(css=app_css) as app:
     
-    with gr.Group(elem_classes="splash-image-container") as splash_group:
-        gr.Image("E:/FYP/4.png", elem_id="splash-image", 
-                show_label=False, show_download_button=False)
-
-    # Enhanced Home Page Only
-    with gr.Tab("Home", visible=False) as main_group:
-        with gr.Column(elem_classes="home-page"):
-            # Elegant Islamic-themed Header
-            with gr.Row(elem_classes="header"):
-                gr.HTML("""
-                <div>
-                    <h1>Al-Hafiz Companion</h1>
-                    <p>The Ultimate Hifz Learning System</p>
-                </div>
-                """)
+        with gr.Group(elem_classes="splash-image-container") as splash_group:
+            gr.Image("E:/FYP/4.png", elem_id="splash-image", 
+                    show_label=False, show_download_button=False)
+
+        # Enhanced Home Page Only
+        with gr.Tab("Home", visible=False) as main_group:
+            with gr.Column(elem_classes="home-page"):
+                # Elegant Islamic-themed Header
+                with gr.Row(elem_classes="header"):
+                    gr.HTML("""
+                    <div>
+                        <h1>Al-Hafiz Companion</h1>
+                        <p>The Ultimate Hifz Learning System</p>
+                    </div>
+                    """)
             
-            # Decorative Search Box
-            with gr.Row(elem_classes="search-container"):
-                search_box = gr.Textbox(placeholder="Search by Surah number...", 
-                                      elem_classes="search-box")
+                # Start-up progress of the speech model
+                model_status = gr.HTML()
             
-            # Beautiful Surah Grid
-            with gr.Row():
-                with gr.Column(elem_classes="surah-grid"):
-                    selected_surah = gr.Number(value=1, visible=False)
+                # Decorative Search Box
+                with gr.Row(elem_classes="search-container"):
+                    search_box = gr.Textbox(placeholder="Search by Surah number...", 
+                                          elem_classes="search-box")
+            
+                # Free recitation: the surah and ayah are found from what is recited
+                with gr.Row():
+                    locate_button = gr.Button("Recite from anywhere", elem_classes="locate-button")
+            
+                # Beautiful Surah Grid
+                with gr.Row():
+                    with gr.Column(elem_classes="surah-grid"):
+                        selected_surah = gr.Number(value=1, visible=False)
                     
-                    surah_cards = []
-                    for surah_num in range(1, 115):
-                        surah_name_ar = surah_names.get(surah_num, {}).get("ar", f"سورة {surah_num}")
-                        card = gr.HTML(
-                            f"""
-                            <div class="surah-card" onclick="this.dispatchEvent(new Event('click'))">
-                                <div class="surah-number">{surah_num}</div>
-                                <div class="surah-name-arabic">{surah_name_ar}</div>
-                            </div>
-                            """,
-                            visible=True
-                        )
-                        card.click(fn=lambda x=surah_num: x, outputs=selected_surah)
-                        surah_cards.append(card)
+                        surah_cards = []
+                        for surah_num in range(1, 115):
+                            surah_name_ar = surah_names.get(surah_num, {}).get("ar", f"سورة {surah_num}")
+                            card = gr.HTML(
+                                f"""
+                                <div class="surah-card" onclick="this.dispatchEvent(new Event('click'))">
+                                    <div class="surah-number">{surah_num}</div>
+                                    <div class="surah-name-arabic">{surah_name_ar}</div>
+                                </div>
+                                """,
+                                visible=True
+                            )
+                            card.click(fn=lambda x=surah_num: x, outputs=selected_surah)
+                            surah_cards.append(card)
             
-            search_box.change(fn=filter_surahs, inputs=search_box, outputs=surah_cards)
-
-    # Real-time Recitation tab
-    with gr.Tab("Real-time Recitation"):
-        with gr.Column(elem_classes="recitation-container"):
-            # Surah display
-            with gr.Row():
-                with gr.Column():
-                    surah_content_display = gr.HTML()
+                search_box.change(fn=filter_surahs, inputs=search_box, outputs=surah_cards)
+                locate_button.click(fn=lambda: 0, outputs=selected_surah)
+
+        # Real-time Recitation tab
+        with gr.Tab("Real-time Recitation"):
+            with gr.Column(elem_classes="recitation-container"):
+                # Surah display
+                with gr.Row():
+                    with gr.Column():
+                        # Recitations are kept in the history under this name
+                        student_name = gr.Textbox(label="Student", placeholder="Your name")
+                        surah_content_display = gr.HTML()
+                        # The reciter's own microphone when the app is hosted
+                        browser_mic = gr.Audio(sources=["microphone"], streaming=True, type="numpy",
+                                               label="Microphone", visible=audio_source == "browser")
+                        # Per-ayah patches to the display, applied in the browser
+                        display_patch = gr.JSON(visible=False)
         
-        # Floating microphone button
-        mic_button = gr.Button("🎤", elem_classes="mic-button", elem_id="stop-button")
-
-        # Event handlers
-        mic_button.click(
-            fn=lambda: (stop_recitation(), None),
-            outputs=[surah_content_display, gr.Textbox(visible=False)]
-        )
-        mic_button.click(
-            recognize_generator, 
-            inputs=selected_surah, 
-            outputs=surah_content_display
-        )
-        selected_surah.change(
-            lambda x: display_surah_content(x, show_title=False, highlight_current_word=1),
-            inputs=selected_surah, 
-            outputs=surah_content_display
-        )
-
-    def show_main():
-        time.sleep(3)
-        return gr.update(visible=False), gr.update(visible=True)
-    
-    app.load(show_main, outputs=[splash_group, main_group])
+            # Weakest ayahs of the student over the last 30 days
+            with gr.Accordion("My progress", open=False):
+                progress_display = gr.HTML()
+                progress_button = gr.Button("Show weakest ayahs")
+            progress_button.click(progress_report, inputs=student_name, outputs=progress_display,
+                                  api_name="progress")
+        
+            # Stage timings (ms) for finding where the time goes under load
+            with gr.Accordion("Debug metrics", open=False):
+                metrics_display = gr.JSON()
+                metrics_button = gr.Button("Refresh metrics")
+            metrics_button.click(metrics_report, outputs=metrics_display, api_name="metrics")
+        
+            # Floating microphone button
+            mic_button = gr.Button("🎤", elem_classes="mic-button", elem_id="stop-button")
 
-app.launch()
\ No newline at end of file
+            # Event handlers
+            def stop_and_clear(request: gr.Request):
+                return stop_recitation(request), None
+        
+            # Stopping only flips the session's flags and closes its audio buffer, so no
+            # user's stop waits for another's
+            mic_button.click(
+                fn=stop_and_clear,
+                outputs=[surah_content_display, gr.Textbox(visible=False)],
+                concurrency_limit=None
+            )
+            mic_button.click(
+                recognize_generator, 
+                inputs=[selected_surah, student_name], 
+                outputs=[surah_content_display, display_patch],
+                concurrency_limit=max_concurrent_sessions
+            )
+            # Chunks go through the queue like any event but with no concurrency limit, so
+            # one user's audio never waits for another's; a session's own chunks are
+            # written in order under its input_lock
+            browser_mic.stream(receive_audio, inputs=browser_mic, concurrency_limit=None,
+                               show_progress="hidden")
+            display_patch.change(fn=None, inputs=display_patch, js=APPLY_PATCH_JS)
+            selected_surah.change(
+                show_selected_surah,
+                inputs=selected_surah, 
+                outputs=surah_content_display
+            )
+
+        def model_status_html():
+            progress = decoder_loader.progress()
+            if progress["ready"]:
+                return f"<div class='model-status'>Speech model ready ({progress['seconds']:.1f} s)</div>"
+            if progress["error"]:
+                return f"<div class='model-status error'>{progress['message']}</div>"
+            return f"""
+            <div class='model-status'>
+                {progress['message']}
+                <progress value="{progress['fraction']:.2f}" max="1"></progress>
+            </div>
+            """
+    
+        def show_main():
+            # The home page shows straight away and follows the model loading behind it
+            yield gr.update(visible=False), gr.update(visible=True), model_status_html()
+            while not decoder_loader.done:
+                decoder_loader.wait(0.5)
+                yield gr.update(), gr.update(), model_status_html()
+    
+        app.load(show_main, outputs=[splash_group, main_group, model_status], concurrency_limit=None)
+    
+        def close_session(request: gr.Request):
+            sessions.discard(request.session_hash)
+    
+        app.unload(close_session)
+
+    return app
+
+def main():
+    global quran, surah_names, history
+    quran, surah_names = load_corpus("E:/FYP/quran-simple.txt", "E:/FYP/surah_mapping_arabic.txt")
+    decoder_loader.start()
+    history = HistoryStore(history_path)
+    # Rows still queued are written before the process exits
+    atexit.register(history.close)
+    build_ui().launch()
+
+# Decoder worker processes started with spawn or forkserver (the default on
+# Windows) re-import this file as __mp_main__, so they skip loading the corpus
+# and building the UI
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""Recitation history kept in SQLite, per student, across restarts.
+
+Every recitation and each of its finished ayahs (with the score of every
+word) is recorded. The recognition loop only puts rows on a queue; one
+writer thread commits them in batches, so recording never waits on disk.
+"""
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS recitations (
+    id INTEGER PRIMARY KEY,
+    student INTEGER NOT NULL REFERENCES students(id),
+    session TEXT,
+    surah INTEGER,
+    started REAL NOT NULL,
+    ended REAL
+);
+CREATE INDEX IF NOT EXISTS recitations_student ON recitations(student, started);
+CREATE TABLE IF NOT EXISTS ayah_results (
+    recitation INTEGER NOT NULL REFERENCES recitations(id),
+    surah INTEGER NOT NULL,
+    ayah INTEGER NOT NULL,
+    recorded REAL NOT NULL,
+    words INTEGER NOT NULL,
+    correct INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ayah_results_recitation ON ayah_results(recitation, surah, ayah, words, correct);
+CREATE TABLE IF NOT EXISTS word_results (
+    recitation INTEGER NOT NULL REFERENCES recitations(id),
+    surah INTEGER NOT NULL,
+    ayah INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    recited TEXT
+);
+CREATE INDEX IF NOT EXISTS word_results_recitation ON word_results(recitation, surah, ayah, position, score);
+"""
+
+_INSERT_STUDENT = "INSERT OR IGNORE INTO students (name) VALUES (?)"
+_INSERT_RECITATION = """
+INSERT INTO recitations (id, student, session, surah, started)
+VALUES (?, (SELECT id FROM students WHERE name = ?), ?, ?, ?)
+"""
+_INSERT_AYAH = "INSERT INTO ayah_results (recitation, surah, ayah, recorded, words, correct) VALUES (?, ?, ?, ?, ?, ?)"
+_INSERT_WORD = "INSERT INTO word_results (recitation, surah, ayah, position, score, recited) VALUES (?, ?, ?, ?, ?, ?)"
+_FINISH_RECITATION = "UPDATE recitations SET ended = ? WHERE id = ?"
+
+# Recitations of one student since a time; the queries below join their results to it
+_STUDENT_RECITATIONS = """
+SELECT r.id FROM recitations r JOIN students s ON s.id = r.student
+WHERE s.name = ? AND r.started >= ?
+"""
+
+
+class HistoryStore:
+    """SQLite store of recitation results with a background batch writer.
+
+    start_recitation, record_ayah and finish_recitation return at once;
+    the rows are written by the writer thread, at most batch_size per
+    transaction and within flush_interval seconds of being queued. If the
+    writer falls more than max_pending rows behind, new rows are dropped
+    and counted rather than slowing down recitations.
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=1.0, max_pending=100000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_pending)
+        self.dropped = 0
+        self.written = 0
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # Readers are not blocked by the writer, and commits do not wait for an fsync each
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def start_recitation(self, student, session=None, surah=None):
+        """Record that a student started reciting; returns the recitation's id"""
+        # Chosen here so the caller never waits for the insert
+        recitation = secrets.randbits(62)
+        self._put(("start", (student,), (recitation, student, session, surah, time.time())))
+        return recitation
+
+    def record_ayah(self, recitation, surah, ayah, scores, recited_words, word_count, correct):
+        """Record a finished ayah and the score of each of its recited words"""
+        words = [
+            (recitation, surah, ayah, position, int(score), recited_words[position] if position < len(recited_words) else None)
+            for position, score in enumerate(scores)
+        ]
+        self._put(("ayah", (recitation, surah, ayah, time.time(), word_count, correct), words))
+
+    def finish_recitation(self, recitation):
+        self._put(("finish", (time.time(), recitation), None))
+
+    def _write(self, conn, batch):
+        with conn:
+            for kind, row, extra in batch:
+                if kind == "start":
+                    conn.execute(_INSERT_STUDENT, row)
+                    conn.execute(_INSERT_RECITATION, extra)
+                elif kind == "ayah":
+                    conn.execute(_INSERT_AYAH, row)
+                    conn.executemany(_INSERT_WORD, extra)
+                elif kind == "finish":
+                    conn.execute(_FINISH_RECITATION, row)
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            try:
+                self._write(conn, batch)
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                print(f"Error writing recitation history: {e}")
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+        conn.close()
+
+    def flush(self):
+        """Wait until everything queued so far is written"""
+        self._queue.join()
+
+    def close(self):
+        """Write what is queued and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._read_lock:
+            self._reader.close()
+
+    def _query(self, sql, params):
+        with self._read_lock:
+            cursor = self._reader.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def weakest_ayahs(self, student, days=30, limit=10, min_attempts=1):
+        """The student's ayahs with the lowest share of correct words over the last days"""
+        return self._query(f"""
+            SELECT a.surah, a.ayah, COUNT(*) AS attempts, SUM(a.words - a.correct) AS errors,
+                   100.0 * SUM(a.correct) / SUM(a.words) AS accuracy, MAX(a.recorded) AS last_recited
+            FROM ayah_results a
+            WHERE a.recitation IN ({_STUDENT_RECITATIONS}) AND a.words > 0
+            GROUP BY a.surah, a.ayah
+            HAVING attempts >= ?
+            ORDER BY accuracy, attempts DESC
+            LIMIT ?
+        """, (student, time.time() - days * 86400, min_attempts, limit))
+
+    def weakest_words(self, student, days=30, limit=10, accuracy_threshold=67):
+        """The word positions the student most often got wrong over the last days"""
+        return self._query(f"""
+            SELECT w.surah, w.ayah, w.position, COUNT(*) AS attempts,
+                   SUM(w.score < ?) AS errors, AVG(w.score) AS average_score
+            FROM word_results w
+            WHERE w.recitation IN ({_STUDENT_RECITATIONS})
+            GROUP BY w.surah, w.ayah, w.position
+            HAVING errors > 0
+            ORDER BY errors DESC, average_score
+            LIMIT ?
+        """, (accuracy_threshold, student, time.time() - days * 86400, limit))
+
+    def student_summary(self, student, days=30):
+        """Recitations, ayahs and overall accuracy of the student over the last days"""
+        since = time.time() - days * 86400
+        return self._query(f"""
+            SELECT (SELECT COUNT(*) FROM ({_STUDENT_RECITATIONS})) AS recitations,
+                   COUNT(*) AS ayahs, SUM(a.words) AS words, SUM(a.correct) AS correct,
+                   100.0 * SUM(a.correct) / SUM(a.words) AS accuracy
+            FROM ayah_results a
+            WHERE a.recitation IN ({_STUDENT_RECITATIONS})
+        """, (student, since, student, since))[0]
+
+    def stats(self):
+        return {"pending": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
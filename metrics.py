@@ -0,0 +1,110 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets, in milliseconds; one more bucket
+# catches everything slower
+BUCKETS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """Fixed-bucket histogram: constant memory however many values it sees"""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (max for the last bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": [[bound, n] for bound, n in zip(BUCKETS_MS + ("inf",), self.counts) if n],
+        }
+
+
+class Tick:
+    """Times the stages of one loop iteration, each lap since the previous one"""
+    __slots__ = ("metrics", "start", "last")
+
+    def __init__(self, metrics, start):
+        self.metrics = metrics
+        self.start = self.last = start
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(stage, (now - self.last) * 1000)
+        self.last = now
+
+    def done(self):
+        self.metrics.observe("tick", (time.perf_counter() - self.start) * 1000)
+
+
+class RecitationMetrics:
+    """Per-session histograms of stage timings (ms) and other per-tick values"""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def tick(self, waited_since):
+        """Start timing an iteration; the time spent waiting for audio is recorded first"""
+        now = time.perf_counter()
+        self.observe("wait", (now - waited_since) * 1000)
+        return Tick(self, now)
+
+    def merge_into(self, totals):
+        with self._lock:
+            for name, histogram in self.histograms.items():
+                totals.setdefault(name, Histogram()).merge(histogram)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+
+def combined_snapshot(all_metrics):
+    """One snapshot of several sessions' metrics added together"""
+    totals = {}
+    for metrics in all_metrics:
+        metrics.merge_into(totals)
+    return {name: histogram.snapshot() for name, histogram in totals.items()}
@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class BackgroundLoader:
+    """Runs a slow start-up step in a background thread and tracks its progress.
+
+    load is called with a report(fraction, message) function and its return
+    value becomes `result`. Code that needs the result wait()s for it; the
+    rest of the app keeps serving and can show progress() meanwhile.
+    """
+
+    def __init__(self, load, name="background-loader"):
+        self._load = load
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.fraction = 0.0
+        self.message = "Waiting to start"
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def report(self, fraction, message):
+        self.fraction = fraction
+        self.message = message
+
+    def _run(self):
+        try:
+            self.result = self._load(self.report)
+            self.report(1.0, "Ready")
+        except Exception as e:
+            self.error = e
+            self.message = f"Loading failed: {e}"
+            print(self.message)
+        finally:
+            self.finished = time.perf_counter()
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        """Block until loading has finished or failed; False on timeout"""
+        return self._done.wait(timeout)
+
+    def progress(self):
+        end = self.finished or time.perf_counter()
+        return {
+            "fraction": self.fraction,
+            "message": self.message,
+            "ready": self.ready,
+            "error": repr(self.error) if self.error else None,
+            "seconds": end - self.started if self.started else 0.0,
+        }
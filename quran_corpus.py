@@ -0,0 +1,230 @@
+import threading
+
+import numpy as np
+
+from arabic_text import normalize_forms, strip_diacritics
+from memo_cache import LRUCache
+from similarity import register_id_pair_cache
+
+
+class WordSeq:
+    """A run of words with their normalized and diacritic-free forms precomputed.
+
+    ids holds the words' Vocabulary IDs once Vocabulary.ids_of() has mapped them.
+    """
+    __slots__ = ("words", "norm_words", "skeleton_words", "ids")
+
+    def __init__(self, words, norm_words=None, skeleton_words=None, ids=None):
+        self.words = tuple(words)
+        if norm_words is None:
+            forms = [normalize_forms(w) for w in self.words]
+            norm_words = [norm for norm, _ in forms]
+            skeleton_words = [skeleton for _, skeleton in forms]
+        elif skeleton_words is None:
+            skeleton_words = [strip_diacritics(w) for w in norm_words]
+        self.norm_words = tuple(norm_words)
+        self.skeleton_words = tuple(skeleton_words)
+        self.ids = ids
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text.split())
+
+    @staticmethod
+    def _of(words, norm_words, skeleton_words, ids):
+        # Forms that are tuples already need none of the conversions in __init__
+        seq = object.__new__(WordSeq)
+        seq.words, seq.norm_words, seq.skeleton_words, seq.ids = words, norm_words, skeleton_words, ids
+        return seq
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return WordSeq._of(self.words[index], self.norm_words[index], self.skeleton_words[index],
+                               None if self.ids is None else self.ids[index])
+        return self.words[index]
+
+    def __add__(self, other):
+        ids = None if self.ids is None or other.ids is None else np.concatenate((self.ids, other.ids))
+        return WordSeq._of(self.words + other.words, self.norm_words + other.norm_words,
+                           self.skeleton_words + other.skeleton_words, ids)
+
+    def text(self):
+        return " ".join(self.words)
+
+
+class Ayah(WordSeq):
+    """One ayah of the corpus, split and normalized once at load time"""
+    __slots__ = ("surah", "number", "raw_text", "word_count")
+
+    def __init__(self, surah, number, text, norm_words=None, skeleton_words=None, ids=None):
+        # The word forms and IDs can come precomputed from the corpus cache
+        super().__init__(text.split(), norm_words, skeleton_words, ids)
+        self.surah = surah
+        self.number = number
+        self.raw_text = text
+        self.word_count = len(self.words)
+
+
+class Vocabulary:
+    """Interned word forms: every distinct normalized word gets an integer ID.
+
+    The corpus stores its words as IDs and recognized words are mapped to
+    IDs once, so alignment compares integers: equal IDs are equal normalized
+    forms (a score of 100) and other pairs are scored once per ID pair.
+    Words the recognizer outputs that are not in the corpus are added as
+    they are first seen.
+    """
+
+    def __init__(self, norms=(), skeletons=(), cache_size=200000):
+        self.norms = list(norms)
+        self.skeletons = list(skeletons)
+        self._ids = {norm: i for i, norm in enumerate(self.norms)}
+        self._lock = threading.Lock()
+        self.pair_cache = LRUCache(cache_size)  # (expected_id << 32 | recited_id) -> score
+        register_id_pair_cache(self.pair_cache)
+
+    def __len__(self):
+        return len(self.norms)
+
+    def intern(self, norm, skeleton):
+        word_id = self._ids.get(norm)
+        if word_id is None:
+            with self._lock:
+                word_id = self._ids.get(norm)
+                if word_id is None:
+                    # The forms are stored before the ID is published
+                    word_id = len(self.norms)
+                    self.norms.append(norm)
+                    self.skeletons.append(skeleton)
+                    self._ids[norm] = word_id
+        return word_id
+
+    def ids_of(self, seq):
+        """IDs of a WordSeq's words as an int32 array, mapped once and kept on it"""
+        if seq.ids is None:
+            seq.ids = np.fromiter(map(self.intern, seq.norm_words, seq.skeleton_words),
+                                  dtype=np.int32, count=len(seq))
+        return seq.ids
+
+    def seq(self, words, ids):
+        """WordSeq of words whose IDs are known, with the forms taken from the vocabulary"""
+        return WordSeq(words, [self.norms[i] for i in ids], [self.skeletons[i] for i in ids],
+                       np.array(ids, dtype=np.int32))
+
+    def stats(self):
+        # The pair cache is reported by similarity.cache_stats()
+        return {"words": len(self.norms)}
+
+
+class QuranCorpus:
+    """Indexed Quran text: surah -> ayah -> Ayah, plus per-surah ayah counts.
+
+    pack() also lays every word out flat as vocabulary IDs: word_ids holds
+    the whole corpus, ayah row r covers word_ids[ayah_offsets[r]:ayah_offsets[r + 1]]
+    and the rows of surah s are surah_offsets[s] to surah_offsets[s + 1].
+    """
+
+    def __init__(self, vocab=None):
+        self.surahs = {}
+        self.max_ayah = {}
+        self.longest_ayah = {}  # Word count of the longest ayah in each surah
+        self.vocab = vocab or Vocabulary()
+        self.word_ids = None
+        self.ayah_offsets = None
+        self.surah_offsets = None
+
+    def add(self, surah, ayah, text):
+        entry = Ayah(surah, ayah, text)
+        self.vocab.ids_of(entry)
+        self.surahs.setdefault(surah, {})[ayah] = entry
+        if ayah > self.max_ayah.get(surah, 0):
+            self.max_ayah[surah] = ayah
+        if entry.word_count > self.longest_ayah.get(surah, 0):
+            self.longest_ayah[surah] = entry.word_count
+        return entry
+
+    def __contains__(self, surah):
+        return surah in self.surahs
+
+    def __len__(self):
+        return len(self.surahs)
+
+    def get(self, surah, ayah):
+        """Return the Ayah entry or None"""
+        return self.surahs.get(surah, {}).get(ayah)
+
+    def get_ayah(self, surah, ayah):
+        """Return the raw ayah text, or "" if it does not exist"""
+        entry = self.get(surah, ayah)
+        return entry.raw_text if entry else ""
+
+    def ayah_numbers(self, surah):
+        return sorted(self.surahs.get(surah, {}).keys())
+
+    def iter_ayahs(self):
+        for surah in sorted(self.surahs):
+            for ayah in sorted(self.surahs[surah]):
+                yield self.surahs[surah][ayah]
+
+    def row_ayahs(self):
+        """Surah and ayah number of every row of the flat arrays, as two int32 arrays"""
+        surahs, numbers = [], []
+        for surah in sorted(self.surahs):
+            ayahs = self.ayah_numbers(surah)
+            surahs.append(np.full(len(ayahs), surah, dtype=np.int32))
+            numbers.append(np.array(ayahs, dtype=np.int32))
+        if not surahs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        return np.concatenate(surahs), np.concatenate(numbers)
+
+    def pack(self):
+        """Move the ayahs' word IDs into the flat arrays; each Ayah keeps a view of its slice"""
+        ayahs = list(self.iter_ayahs())
+        self.ayah_offsets = np.zeros(len(ayahs) + 1, dtype=np.int64)
+        np.cumsum([ayah.word_count for ayah in ayahs], out=self.ayah_offsets[1:])
+        self.word_ids = np.concatenate([ayah.ids for ayah in ayahs]) if ayahs else np.zeros(0, dtype=np.int32)
+        rows_per_surah = np.bincount([ayah.surah for ayah in ayahs], minlength=max(self.surahs, default=0) + 1)
+        self.surah_offsets = np.zeros(len(rows_per_surah) + 1, dtype=np.int64)
+        np.cumsum(rows_per_surah, out=self.surah_offsets[1:])
+        for row, ayah in enumerate(ayahs):
+            ayah.ids = self.word_ids[self.ayah_offsets[row]:self.ayah_offsets[row + 1]]
+
+
+# Load Quran data
+def load_quran(file_path):
+    quran = QuranCorpus()
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split('|')
+                if len(parts) == 3:
+                    surah, ayah, text = parts
+                    quran.add(int(surah), int(ayah), text)
+    except Exception as e:
+        print(f"Error loading Quran file: {e}")
+    quran.pack()
+    return quran
+
+# Load Surah names from file
+def load_surah_names(file_path):
+    surah_names = {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split(':')
+                if len(parts) == 2:
+                    surah_num = int(parts[0].strip())
+                    surah_name = parts[1].strip()
+                    surah_names[surah_num] = {
+                        "en": f"Surah {surah_num}",
+                        "ar": surah_name
+                    }
+    except Exception as e:
+        print(f"Error loading surah names file: {e}")
+        # Fallback to default names if file can't be loaded
+        for i in range(1, 115):
+            surah_names[i] = {"en": f"Surah {i}", "ar": f"سورة {i}"}
+    return surah_names
@@ -0,0 +1,179 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+from arabic_text import fold_letters
+from quran_corpus import WordSeq
+from similarity import score_pairs
+
+
+def fold_vocabulary(vocab, count):
+    """Folded skeletons of the first count vocabulary words as small integer IDs.
+
+    Returns an array of the folded ID of every word ID and the folded IDs
+    by folded form; words that fold alike share an ID.
+    """
+    fold_ids = {}
+    folded = np.fromiter((fold_ids.setdefault(fold_letters(skeleton), len(fold_ids))
+                          for skeleton in vocab.skeletons[:count]), dtype=np.int32, count=count)
+    return folded, fold_ids
+
+
+class Postings:
+    """Integer key -> the values stored under it, as two arrays sorted by key.
+
+    Values under one key keep the order they were given in.
+    """
+
+    def __init__(self, keys, values):
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.values = values[order]
+
+    def get(self, key):
+        first, end = self.keys.searchsorted(key), self.keys.searchsorted(key + 1)
+        return self.values[first:end].tolist() if end > first else []
+
+
+class RestartIndex:
+    """Inverted index of ayah openings used to detect backward jumps.
+
+    Maps (surah, word position, folded skeleton) to the ayahs that have that
+    word at that position, so the words recited since the last ayah boundary
+    can vote for the earlier ayahs they could be restarting. Built from the
+    corpus' flat word ID arrays, without turning ayahs into objects.
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        word_ids, offsets = np.asarray(corpus.word_ids), np.asarray(corpus.ayah_offsets)
+        row_surah, row_ayah = corpus.row_ayahs()
+        counts = np.diff(offsets)
+        self.folded, self.fold_ids = fold_vocabulary(corpus.vocab, int(word_ids.max(initial=-1)) + 1)
+        self.positions = int(counts.max(initial=0)) + 1
+
+        rows = np.repeat(np.arange(len(counts)), counts)
+        pos = np.arange(len(word_ids)) - offsets[rows]
+        self.postings = Postings(self._key(row_surah[rows].astype(np.int64), pos, self.folded[word_ids]),
+                                 row_ayah[rows])
+
+        # Word count of every ayah: surah -> array indexed by ayah number
+        self.word_counts = {}
+        for surah in np.unique(row_surah).tolist():
+            in_surah = row_surah == surah
+            table = self.word_counts[surah] = np.zeros(row_ayah[in_surah].max() + 1, dtype=np.int32)
+            table[row_ayah[in_surah]] = counts[in_surah]
+
+    def _key(self, surah, pos, fold_id):
+        return (surah * self.positions + pos) * len(self.fold_ids) + fold_id
+
+    def lookup(self, surah, pos, skeleton):
+        """Ayahs of the surah whose word at pos looks like the given skeleton"""
+        fold_id = self.fold_ids.get(fold_letters(skeleton))
+        if fold_id is None or pos >= self.positions:
+            return ()
+        return self.postings.get(self._key(surah, pos, fold_id))
+
+    def candidates(self, surah, votes, word_count, before_ayah, limit=3):
+        """Best voted ayahs of exactly word_count words that come before before_ayah"""
+        counts = self.word_counts[surah]
+        eligible = [
+            (count, -ayah_num)
+            for ayah_num, count in votes.items()
+            if ayah_num < before_ayah and counts[ayah_num] == word_count
+        ]
+        # Most votes first, earliest ayah on ties to match the old linear scan
+        return [-neg for _, neg in heapq.nlargest(limit, eligible)]
+
+
+class QuranLocator:
+    """Finds where in the whole Quran a few recognized words were recited.
+
+    Every word of the corpus gets a global offset (pause marks excluded, as
+    the recognizer never outputs them), and each pair of consecutive folded
+    skeletons points back at the offsets where it occurs. A query votes for
+    the start offset each of its word pairs implies; only the best voted
+    starts are scored word by word. Like RestartIndex it is built from the
+    corpus' flat arrays and keeps only arrays of integers.
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.vocab = corpus.vocab
+        word_ids, offsets = np.asarray(corpus.word_ids), np.asarray(corpus.ayah_offsets)
+        self.row_surah, self.row_ayah = corpus.row_ayahs()
+        folded, self.fold_ids = fold_vocabulary(corpus.vocab, int(word_ids.max(initial=-1)) + 1)
+
+        rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+        keep = folded[word_ids] != self.fold_ids.get("", -1)
+        self.word_ids = word_ids[keep]    # Global offset -> vocabulary ID
+        self.word_rows = rows[keep]       # Global offset -> row of its ayah
+        self.row_start = np.searchsorted(self.word_rows, np.arange(len(offsets) - 1))  # Row -> offset of its first word
+
+        keys = folded[self.word_ids].astype(np.int64)
+        self.postings = Postings(keys[:-1] * len(self.fold_ids) + keys[1:], np.arange(len(keys) - 1, dtype=np.int32))
+
+    def _score(self, starts, query, accuracy_threshold):
+        """Percentage of query words matching the corpus words from each start"""
+        norms, skeletons = self.vocab.norms, self.vocab.skeletons
+        expected_norms, expected_bases, recited_norms, recited_bases, owner = [], [], [], [], []
+        for n, start in enumerate(starts):
+            ids = self.word_ids[start:start + len(query)].tolist()
+            expected_norms.extend(norms[i] for i in ids)
+            expected_bases.extend(skeletons[i] for i in ids)
+            recited_norms.extend(query.norm_words[:len(ids)])
+            recited_bases.extend(query.skeleton_words[:len(ids)])
+            owner.extend([n] * len(ids))
+
+        # Every candidate is scored in a single batch
+        scores = score_pairs(expected_norms, expected_bases, recited_norms, recited_bases)
+        matches = np.bincount(np.array(owner, dtype=np.int64), weights=scores >= accuracy_threshold,
+                              minlength=len(starts))
+        return matches / len(query) * 100
+
+    def locate(self, query, min_words=4, max_words=12, limit=5, accuracy_threshold=67):
+        """Locate a WordSeq of recognized words.
+
+        Returns None until the query is long and clear enough, otherwise a dict
+        with the "surah" and "ayah" to start tracking at and the number of
+        "skip_words" the reciter still has left of the ayah they started in.
+        A query that fits several places equally well (repeated phrases) waits
+        for more words, up to max_words, and then takes the earliest.
+        """
+        keep = [j for j, base in enumerate(query.skeleton_words) if fold_letters(base)]
+        if len(keep) < min_words:
+            return None
+        query = WordSeq([query.words[j] for j in keep],
+                        [query.norm_words[j] for j in keep],
+                        [query.skeleton_words[j] for j in keep])
+
+        # Words the corpus does not have cannot vote
+        keys = [self.fold_ids.get(fold_letters(base)) for base in query.skeleton_words]
+        votes = defaultdict(int)
+        for j in range(len(keys) - 1):
+            if keys[j] is None or keys[j + 1] is None:
+                continue
+            for offset in self.postings.get(keys[j] * len(self.fold_ids) + keys[j + 1]):
+                if offset >= j:
+                    votes[offset - j] += 1
+        if not votes:
+            return None
+
+        starts = heapq.nlargest(limit, votes, key=votes.get)
+        scored = sorted(zip((-self._score(starts, query, accuracy_threshold)).tolist(), starts))
+        best_score, best_start = -scored[0][0], scored[0][1]
+        if best_score < accuracy_threshold:
+            return None
+        if len(scored) > 1 and scored[1][0] == scored[0][0] and len(query) < max_words:
+            return None
+
+        row = int(self.word_rows[best_start])
+        match = {"surah": int(self.row_surah[row]), "ayah": int(self.row_ayah[row]), "skip_words": 0,
+                 "score": best_score}
+        if best_start != self.row_start[row] and row + 1 < len(self.row_start):
+            # Started mid-ayah: track from the next ayah once this one is finished
+            following = row + 1
+            match["surah"], match["ayah"] = int(self.row_surah[following]), int(self.row_ayah[following])
+            match["skip_words"] = int(self.row_start[following]) - best_start
+        return match
@@ -0,0 +1,215 @@
+from quran_corpus import WordSeq
+from similarity import score_words
+
+
+def highlight_words(expected, recited, accuracy_threshold=67, current_word_index=None, scores=None):
+    """Colour each word of the expected Ayah/WordSeq against the recited WordSeq"""
+    if scores is None:
+        scores = score_words(expected, recited)
+
+    highlighted = []
+    accuracy_count = 0
+    error_details = []
+    
+    for i, e in enumerate(expected.words):
+        # Default to uncolored text
+        word_style = ""
+        
+        # Only apply coloring if we have recited words to compare
+        if i < len(scores):
+            similarity = scores[i]
+            if similarity >= accuracy_threshold:
+                word_style = "color: green;"
+                accuracy_count += 1
+            else:
+                word_style = "color: red;"
+                error_details.append({
+                    "position": i,
+                    "expected": e,
+                    "recited": recited.words[i],
+                    "similarity": similarity
+                })
+        
+        # Always apply underline to current word
+        if current_word_index is not None and i == current_word_index:
+            word_style += " border-bottom: 2px solid #0c4b33;"
+        
+        if word_style:
+            highlighted.append(f"<span style='{word_style}'>{e}</span>")
+        else:
+            highlighted.append(e)
+
+    return " ".join(highlighted), accuracy_count, error_details
+
+
+def align_attempt(corpus, aligner, partial_text, accuracy_threshold=67):
+    """Highlight the finalized words of the current ayah plus the partial over the text"""
+    current_attempt = {}
+    partial_words = WordSeq.from_text(partial_text)
+    for ayah_num, attempt in aligner.align_partial(partial_words).items():
+        highlighted, _, _ = highlight_words(
+            corpus.get(aligner.surah, ayah_num), attempt["recited"], accuracy_threshold,
+            current_word_index=attempt["current_word_pos"], scores=attempt["scores"]
+        )
+        current_attempt[ayah_num] = {
+            "text": attempt["recited"].text(),
+            "highlighted": highlighted,
+            "current_word_pos": attempt["current_word_pos"]
+        }
+    return current_attempt
+
+
+def record_ayah(state, ayah, event, accuracy_threshold=67):
+    """Score a completed "ayah" event into the recitation state.
+
+    Returns the ayah's highlighted HTML, how many of its words were correct
+    and the details of the ones that were not.
+    """
+    highlighted, accuracy_count, error_details = highlight_words(
+        ayah, event["recited"], accuracy_threshold, scores=event["scores"]
+    )
+    state["recited_ayahs"][event["ayah"]] = highlighted
+    state["report"].record(event["ayah"], ayah.raw_text, event["recited"].text(), error_details)
+    return highlighted, accuracy_count, error_details
+
+
+def rewind(state, ayah_num):
+    """Drop everything recited after the ayah the reciter went back to"""
+    state["recited_ayahs"] = {
+        recited_num: highlight
+        for recited_num, highlight in state["recited_ayahs"].items()
+        if recited_num < ayah_num
+    }
+    state["partial_result"] = ""
+    state["current_attempt"] = {}
+
+
+def start_surah(state, surah):
+    """Reset the per-surah parts of the state for the next surah"""
+    state["surah"] = surah
+    state["recited_ayahs"] = {}
+    state["current_attempt"] = {}
+    state["partial_result"] = ""
+    state["report"] = ErrorReport()
+
+
+# Harakat of the expected word that are kept when showing a wrongly recited word
+HARAKAT = frozenset('َ' 'ِ' 'ُ' 'ً' 'ٍ' 'ٌ' 'ْ' 'ّ')
+
+
+def hybrid_word(expected_word, recited_word):
+    """The recited letters with the expected word's harakat in their places"""
+    chars = []
+    k = 0
+    for char in expected_word:
+        if char in HARAKAT:
+            chars.append(char)
+        elif k < len(recited_word):
+            chars.append(recited_word[k])
+            k += 1
+    # Any letters the expected word has no place for go at the end
+    chars.append(recited_word[k:])
+    return "".join(chars)
+
+
+def comparison_row(expected_word, recited_word, word_class, similarity):
+    return (
+        f"<tr>"
+        f"<td class='expected-word'>{expected_word}</td>"
+        f"<td class='recited-word {word_class}'>{recited_word}</td>"
+        f"<td class='similarity'>{similarity}%</td>"
+        f"</tr>"
+    )
+
+
+class ErrorReport:
+    """Errors of a surah recitation, kept per ayah as they are finalized.
+
+    Each ayah's errors are indexed by word position and its part of the
+    HTML report is rebuilt only when the ayah is recorded, so the full
+    report is just the parts joined, however long the recitation was.
+    """
+
+    def __init__(self):
+        # Ayah number -> {"expected", "recited", "errors", "by_position", "html"}
+        self.ayahs = {}
+        self.error_count = 0
+
+    def record(self, ayah_num, expected_text, recited_text, error_details):
+        """Add a finalized ayah; errors of earlier attempts at it are kept"""
+        entry = self.ayahs.get(ayah_num)
+        if entry is None:
+            entry = self.ayahs[ayah_num] = {"errors": [], "by_position": {}, "html": ""}
+        entry["expected"] = expected_text
+        entry["recited"] = recited_text
+        entry["errors"].extend(error_details)
+        for error in error_details:
+            # The first error at a position is the one shown
+            entry["by_position"].setdefault(error["position"], error)
+        self.error_count += len(error_details)
+        entry["html"] = self._ayah_html(ayah_num, entry) if entry["errors"] else ""
+
+    @staticmethod
+    def _ayah_html(ayah_num, entry):
+        expected_words = entry["expected"].split()  # Original with full diacritics
+        recited_words = entry["recited"].split()    # What was actually recited
+        by_position = entry["by_position"]
+
+        rows = []
+        for i, expected_word in enumerate(expected_words):
+            error = by_position.get(i)
+            if error is not None:
+                # Show the recited letters with the original harakat where possible
+                recited = hybrid_word(expected_word, recited_words[i]) if i < len(recited_words) else "[Missing]"
+                rows.append(comparison_row(expected_word, recited, "error-word", error["similarity"]))
+            elif i < len(recited_words):
+                # For correct words, show the original harakat
+                rows.append(comparison_row(expected_word, expected_word, "correct-word", 100))
+            else:
+                rows.append(comparison_row(expected_word, "[Missing]", "missing-word", 0))
+
+        return f"""
+        <div class='ayah-error-report'>
+            <h4>Ayah {ayah_num} Errors ({len(entry["errors"])} errors)</h4>
+            <div class='comparison-table'>
+                <table>
+                    <thead>
+                        <tr>
+                            <th>Expected</th>
+                            <th>Your Recitation</th>
+                            <th>Similarity</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {"".join(rows)}
+                    </tbody>
+                </table>
+            </div>
+        </div>
+        """
+
+    def html(self):
+        if not self.error_count:
+            return "<p class='success-message'>Excellent recitation! No errors detected.</p>"
+        return "".join(self.ayahs[ayah_num]["html"] for ayah_num in sorted(self.ayahs))
+
+    def as_dict(self):
+        """The report as plain data, e.g. for JSON"""
+        return {
+            "error_count": self.error_count,
+            "ayahs": [
+                {
+                    "ayah": ayah_num,
+                    "expected": entry["expected"],
+                    "recited": entry["recited"],
+                    "errors": [dict(error, similarity=int(error["similarity"])) for error in entry["errors"]],
+                }
+                for ayah_num, entry in sorted(self.ayahs.items())
+                if entry["errors"]
+            ],
+        }
+
+
+def generate_error_report(state):
+    """HTML report of the errors recorded so far in the surah being recited"""
+    return state["report"].html()
@@ -0,0 +1,133 @@
+import threading
+import time
+
+
+class RecognizerPool:
+    """Bounded pool of pre-warmed recognizers checked out per recitation.
+
+    factory builds one recognizer (e.g. a KaldiRecognizer on the shared
+    model). `warm` of them are built up front so a session starting later
+    does not pay for it; more are built on demand up to `size`. Returned
+    recognizers are Reset() so no decoder state leaks into the next
+    recitation.
+    """
+
+    def __init__(self, factory, size=30, warm=4):
+        self.factory = factory
+        self.size = size
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        # Wait-time and utilization counters
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_in_use = 0
+
+        self.prewarm(warm)
+
+    def prewarm(self, count=1):
+        """Build up to count idle recognizers now, within the pool size"""
+        for _ in range(count):
+            with self._cond:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                recognizer = self.factory()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                raise
+            with self._cond:
+                self._idle.append(recognizer)
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Check out a recognizer, waiting up to timeout seconds; None on timeout"""
+        start = time.perf_counter()
+        build = False
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = None if timeout is None else timeout - (time.perf_counter() - start)
+                if remaining is not None and remaining <= 0:
+                    self.timeouts += 1
+                    return None
+                self._cond.wait(remaining)
+
+            if self._idle:
+                recognizer = self._idle.pop()
+            else:
+                # Reserve the slot; build outside the lock
+                self._created += 1
+                build = True
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+
+        if build:
+            try:
+                recognizer = self.factory()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.perf_counter() - start
+        with self._cond:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited > 0.001:
+                self.waits += 1
+        return recognizer
+
+    def release(self, recognizer):
+        """Reset a recognizer and return it to the pool"""
+        try:
+            recognizer.Reset()
+        except Exception as e:
+            # A recognizer that cannot be reset is dropped and rebuilt later
+            print(f"Discarding recognizer that failed to reset: {e}")
+            self._close(recognizer)
+            with self._cond:
+                self._created -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append(recognizer)
+            self._in_use -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(recognizer):
+        # Remote recognizers hold a stream in a decoder process; local ones have nothing to close
+        close = getattr(recognizer, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing recognizer: {e}")
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "utilization": self._in_use / self.size if self.size else 0.0,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
@@ -0,0 +1,180 @@
+AYAH_MARK = "<sup style='font-size:0.7em;'>۝</sup>"
+
+
+class SurahTemplate:
+    """A surah pre-rendered once into one HTML fragment per ayah.
+
+    Each fragment is its own element with a stable id, so a page can be
+    rebuilt (or patched) by swapping the fragments of the ayahs that changed
+    instead of searching the surah text for them.
+    """
+
+    def __init__(self, corpus, surah):
+        self.surah = surah
+        self.ayah_numbers = corpus.ayah_numbers(surah)
+        self.slot = {ayah_num: i for i, ayah_num in enumerate(self.ayah_numbers)}
+        self.texts = [corpus.get_ayah(surah, ayah_num) for ayah_num in self.ayah_numbers]
+        self.fragments = [self.fragment(ayah_num, text) for ayah_num, text in zip(self.ayah_numbers, self.texts)]
+        self._cursor_fragments = {}
+
+    @staticmethod
+    def fragment(ayah_num, body):
+        return f"<span class='ayah' id='ayah-{ayah_num}'>{body}{AYAH_MARK}</span>"
+
+    def cursor_fragment(self, ayah_num):
+        """The plain ayah with its first word highlighted as the place to start"""
+        fragment = self._cursor_fragments.get(ayah_num)
+        if fragment is None:
+            words = self.texts[self.slot[ayah_num]].split()
+            if words:
+                words[0] = f"<span class='current-word-highlight'>{words[0]}</span>"
+            fragment = self._cursor_fragments[ayah_num] = self.fragment(ayah_num, " ".join(words))
+        return fragment
+
+    @staticmethod
+    def gap(first, last):
+        """Collapsed placeholder for ayahs outside the shown window"""
+        label = f"Ayah {first}" if first == last else f"Ayahs {first}–{last}"
+        return f"<span class='ayah-gap'>⋯ {label} ⋯</span>"
+
+
+_templates = {}
+
+
+def get_template(corpus, surah):
+    """The shared template of a surah, rendered on first use"""
+    template = _templates.get(surah)
+    if template is None:
+        template = _templates[surah] = SurahTemplate(corpus, surah)
+    return template
+
+
+class SurahView:
+    """One recitation's rendering of a surah, kept as a list of ayah slots.
+
+    Recited ayahs, the ayahs of the current attempt and the cursor are layered
+    over the template (attempt over recited over cursor over plain text); a
+    change only re-renders the slots of the ayahs it touches.
+
+    With a window, only a page of 2 * window + 1 ayahs around the followed
+    ayah is rendered and the rest collapse into placeholders, so the page
+    stays the same size however long the surah is.
+    """
+
+    def __init__(self, template, window=None):
+        self.template = template
+        self.slots = list(template.fragments)
+        self.recited = {}
+        self.attempt = {}
+        self.cursor = None
+        self.window = window
+        self.shown = (0, len(self.slots))  # Range of slot indexes on the page
+        if window is not None:
+            self.shown = (0, min(len(self.slots), 2 * window + 1))
+        self.changed = set()  # Ayahs whose slot changed since the last take_patch()
+        self._html = None
+
+    def _refresh(self, ayah_num):
+        index = self.template.slot.get(ayah_num)
+        if index is None:
+            return
+        body = self.attempt.get(ayah_num)
+        if body is None:
+            body = self.recited.get(ayah_num)
+        if body is not None:
+            fragment = self.template.fragment(ayah_num, body)
+        elif ayah_num == self.cursor:
+            fragment = self.template.cursor_fragment(ayah_num)
+        else:
+            fragment = self.template.fragments[index]
+
+        if fragment != self.slots[index]:
+            self.slots[index] = fragment
+            if self.shown[0] <= index < self.shown[1]:
+                self.changed.add(ayah_num)
+                self._html = None
+
+    def set_recited(self, ayah_num, body):
+        self.recited[ayah_num] = body
+        self._refresh(ayah_num)
+
+    def forget_recited(self, ayah_nums):
+        for ayah_num in list(ayah_nums):
+            if self.recited.pop(ayah_num, None) is not None:
+                self._refresh(ayah_num)
+
+    def set_attempt(self, bodies):
+        """Replace the attempt layer with {ayah_num: html}"""
+        previous, self.attempt = self.attempt, bodies
+        for ayah_num in previous.keys() | bodies.keys():
+            if previous.get(ayah_num) != bodies.get(ayah_num):
+                self._refresh(ayah_num)
+
+    def set_cursor(self, ayah_num):
+        if ayah_num == self.cursor:
+            return
+        previous, self.cursor = self.cursor, ayah_num
+        self._refresh(previous)
+        self._refresh(ayah_num)
+
+    def follow(self, ayah_num):
+        """Keep ayah_num on the page; True if the ayahs on the page changed
+
+        The page only moves once ayah_num comes within window // 2 ayahs of
+        its edge, and then by most of a page, so the ayahs in between are
+        patched in place instead of resending the page.
+        """
+        index = self.template.slot.get(ayah_num)
+        if self.window is None or index is None:
+            return False
+        count = len(self.slots)
+        size = 2 * self.window + 1
+        margin = self.window // 2
+        start, end = self.shown
+        if (start == 0 or index >= start + margin) and (end == count or index < end - margin):
+            return False
+        if index >= end - margin:
+            start = index - margin  # Moving forward: leave a few ayahs behind
+        else:
+            start = index + margin + 1 - size  # Moving back: leave a few ahead
+        start = max(0, min(start, count - size))
+        shown = (start, min(count, start + size))
+        if shown == self.shown:
+            return False
+        self.shown = shown
+        self._html = None
+        return True
+
+    def take_patch(self):
+        """{ayah_num: fragment} of the slots changed since the last call"""
+        changed, self.changed = self.changed, set()
+        return {ayah_num: self.slots[self.template.slot[ayah_num]] for ayah_num in sorted(changed)}
+
+    def html(self):
+        """The shown ayahs with every layer applied; only rebuilt after a change"""
+        if self._html is None:
+            start, end = self.shown
+            numbers = self.template.ayah_numbers
+            parts = self.slots[start:end]
+            if start > 0:
+                parts.insert(0, self.template.gap(numbers[0], numbers[start - 1]))
+            if end < len(numbers):
+                parts.append(self.template.gap(numbers[end], numbers[-1]))
+            self._html = " ".join(parts)
+        return self._html
+
+
+# Client side of the patch protocol: replace each changed ayah element in place
+APPLY_PATCH_JS = """
+(patch) => {
+    if (patch && patch.ayahs) {
+        for (const [ayah, html] of Object.entries(patch.ayahs)) {
+            const element = document.getElementById("ayah-" + ayah);
+            if (element) {
+                element.outerHTML = html;
+            }
+        }
+    }
+    return [];
+}
+"""
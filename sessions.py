@@ -0,0 +1,173 @@
+import threading
+import time
+
+from audio_capture import AudioBuffer, Resampler
+from metrics import RecitationMetrics, combined_snapshot
+from recitation import ErrorReport
+
+
+class SessionLimitError(Exception):
+    """Raised when every recitation slot is already in use"""
+
+
+def new_state(surah=1):
+    """Fresh recitation state for one reciter"""
+    return {
+        "surah": surah,
+        "ayah": 1,
+        "aligner": None,
+        "view": None,  # SurahView of the surah being recited
+        "locate_words": [],
+        "running": False,
+        "recited_ayahs": {},
+        "stop_requested": False,
+        "current_attempt": {},
+        "partial_result": "",
+        "last_update": "",
+        "surah_content": "",
+        "report": ErrorReport(),  # Errors per ayah of the surah being recited
+        "recognizer": None,  # Held by this recitation until its loop ends
+        "audio": None,  # AudioBuffer this recitation reads from
+        "completed_surahs": []  # Track completed surahs
+    }
+
+
+class RecitationSession:
+    """One browser session: its own audio buffer, recognizer and recitation state"""
+
+    def __init__(self, session_id, buffer_options=None):
+        self.session_id = session_id
+        self.buffer_options = buffer_options or {}
+        self.audio = AudioBuffer(**self.buffer_options)
+        self.metrics = RecitationMetrics()
+        self.state = new_state()
+        self.starting = False  # A start() is waiting for a recognizer
+        self.closed = False
+        self.last_active = time.time()
+        # Streamed browser audio: its resampler's filter state runs across chunks,
+        # so chunks are converted and written one at a time, in order
+        self.resampler = None
+        self.input_lock = threading.Lock()
+
+    def resampler_for(self, sample_rate):
+        """The resampler of the session's audio stream, new if the stream's rate changed"""
+        if self.resampler is None or self.resampler.source_rate != sample_rate:
+            self.resampler = Resampler(sample_rate)
+        return self.resampler
+
+    @property
+    def active(self):
+        return self.state["recognizer"] is not None
+
+
+class SessionManager:
+    """Per-session recitation objects sharing one loaded Vosk model.
+
+    Every recitation checks a recognizer out of a RecognizerPool when it
+    starts and its loop returns it when it ends, so the pool size caps how
+    many sessions can recite at the same time and a recognizer is never used
+    by two loops. The pool can be set once the model has loaded; sessions
+    exist (and buffer audio) before that.
+    """
+
+    def __init__(self, pool=None, wait_timeout=5.0, buffer_options=None):
+        self.pool = pool
+        self.wait_timeout = wait_timeout
+        self.buffer_options = buffer_options  # AudioBuffer settings for every session
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _get(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = RecitationSession(session_id, self.buffer_options)
+        session.last_active = time.time()
+        return session
+
+    def get(self, session_id):
+        """The session for a browser session id, created on first use"""
+        with self._lock:
+            return self._get(session_id)
+
+    def metrics(self):
+        """Stage timing histograms of every session, and of all of them together"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "active_sessions": sum(session.active for session in sessions),
+            "all": combined_snapshot(session.metrics for session in sessions),
+            "sessions": {
+                # A prefix is enough to tell sessions apart without exposing their ids
+                session.session_id[:8]: {
+                    "active": session.active,
+                    "audio": session.audio.stats(),
+                    "stages": session.metrics.snapshot(),
+                }
+                for session in sessions
+            },
+        }
+
+    def start(self, session_id, surah=1):
+        """Start a new recitation in the session; returns the session and the recitation's state.
+
+        The state carries the recitation's own recognizer and audio buffer.
+        Whoever runs it must call finish() when it ends, however it ends.
+        """
+        with self._lock:
+            if self.pool is None:
+                raise SessionLimitError("The speech model is still loading, please try again shortly.")
+            session = self._get(session_id)
+            if session.starting:
+                raise SessionLimitError("A recitation is already starting, please wait a moment.")
+            session.starting = True
+            # A recitation still running in this session stops, and is woken up
+            # if it is waiting for audio; its loop returns its recognizer
+            session.state["running"] = False
+            session.audio.close()
+
+        recognizer = None
+        try:
+            recognizer = self.pool.acquire(timeout=self.wait_timeout)
+            if recognizer is None:
+                raise SessionLimitError(
+                    f"All {self.pool.size} recitation slots are in use, please try again shortly."
+                )
+            state = new_state(surah)
+            state["running"] = True
+            state["recognizer"] = recognizer
+            state["audio"] = AudioBuffer(**session.buffer_options)
+            with self._lock:
+                if session.closed:
+                    raise SessionLimitError("This session has been closed.")
+                session.state = state
+                session.audio = state["audio"]
+            return session, state
+        except BaseException:
+            if recognizer is not None:
+                self.pool.release(recognizer)
+            raise
+        finally:
+            session.starting = False
+
+    def finish(self, session, state):
+        """Return the recognizer of the recitation using state; called once its loop has ended"""
+        with self._lock:
+            recognizer, state["recognizer"] = state["recognizer"], None
+            state["running"] = False
+            session.last_active = time.time()
+        if recognizer is not None:
+            self.pool.release(recognizer)
+
+    def discard(self, session_id):
+        """Forget a session whose browser tab has gone away.
+
+        Its recitation is only stopped here; the recitation's loop returns
+        the recognizer when it ends, so it is never reset while decoding.
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return
+            session.closed = True
+            session.state["running"] = False
+            session.audio.close()
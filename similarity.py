@@ -0,0 +1,161 @@
+import operator
+import weakref
+
+import numpy as np
+from fuzzywuzzy import fuzz
+from rapidfuzz.distance import Indel
+from rapidfuzz.process import cpdist
+
+from arabic_text import normalize_arabic, strip_diacritics, normalize_cache
+from memo_cache import LRUCache
+
+# Scores keyed by (expected_norm, recited_norm); the base forms are derived
+# from the normalized ones, so they do not need to be part of the key
+pair_cache = LRUCache(200000)
+
+# Every corpus vocabulary's ID pair cache (Vocabulary.pair_cache) registers
+# here, so it is sized and reported together with the caches above
+_id_pair_caches = weakref.WeakSet()
+_id_pair_size = None
+
+
+def register_id_pair_cache(cache):
+    """Size and report a vocabulary's ID pair cache with the process-wide caches"""
+    if _id_pair_size is not None:
+        cache.resize(_id_pair_size)
+    _id_pair_caches.add(cache)
+
+def configure_caches(pair_size=None, normalize_size=None, id_pair_size=None):
+    """Change the bounds of the process-wide word caches"""
+    global _id_pair_size
+    if pair_size is not None:
+        pair_cache.resize(pair_size)
+    if normalize_size is not None:
+        normalize_cache.resize(normalize_size)
+    if id_pair_size is not None:
+        _id_pair_size = id_pair_size
+        for cache in list(_id_pair_caches):
+            cache.resize(id_pair_size)
+
+def cache_stats():
+    return {
+        "word_pairs": pair_cache.stats(),
+        "normalize": normalize_cache.stats(),
+        "id_pairs": [cache.stats() for cache in list(_id_pair_caches)],
+    }
+
+def word_similarity(expected_norm, expected_base, recited_norm, recited_base):
+    """Similarity of two words whose normalized and base forms are already known"""
+    key = (expected_norm, recited_norm)
+    score = pair_cache.get(key)
+    if score is None:
+        score = _word_similarity(expected_norm, expected_base, recited_norm, recited_base)
+        pair_cache.put(key, score)
+    return score
+
+def _word_similarity(expected_norm, expected_base, recited_norm, recited_base):
+    # If they match exactly after normalization
+    if expected_norm == recited_norm:
+        return 100
+
+    # If base letters don't match, return regular similarity
+    if expected_base != recited_base:
+        return fuzz.ratio(expected_norm, recited_norm)
+
+    # If base letters match, be more lenient with diacritics
+    base_similarity = 80  # High base score since letters match
+    diacritic_similarity = fuzz.ratio(expected_norm, recited_norm)
+
+    # Weighted average favoring base letters
+    return int(base_similarity * 0.7 + diacritic_similarity * 0.3)
+
+def calculate_similarity(expected, recited):
+    """Improved similarity calculation for Arabic with diacritics"""
+    # Normalize both texts (this will now group similar diacritics)
+    expected_norm = normalize_arabic(expected)
+    recited_norm = normalize_arabic(recited)
+    return word_similarity(expected_norm, strip_diacritics(expected_norm),
+                           recited_norm, strip_diacritics(recited_norm))
+
+def score_pairs(expected_norms, expected_bases, recited_norms, recited_bases):
+    """Vectorized word_similarity over equally long lists of word forms.
+
+    All pairs are scored in one call to rapidfuzz's compiled pairwise kernel,
+    which computes the same ratio fuzz.ratio gets from python-Levenshtein
+    (2 * LCS / total length), so the integers match word_similarity exactly.
+    """
+    count = len(expected_norms)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    keys = list(zip(expected_norms, recited_norms))
+    cached = pair_cache.get_many(keys)
+    missing = [i for i, score in enumerate(cached) if score is None]
+    if missing:
+        scores = _score_pairs([expected_norms[i] for i in missing], [expected_bases[i] for i in missing],
+                              [recited_norms[i] for i in missing], [recited_bases[i] for i in missing]).tolist()
+        pair_cache.put_many((keys[i], score) for i, score in zip(missing, scores))
+        for i, score in zip(missing, scores):
+            cached[i] = score
+    return np.array(cached, dtype=np.int64)
+
+def _score_pairs(expected_norms, expected_bases, recited_norms, recited_bases):
+    count = len(expected_norms)
+    ratio = cpdist(expected_norms, recited_norms, scorer=Indel.normalized_similarity,
+                   dtype=np.float64, workers=1)
+    ratio = np.rint(100 * ratio).astype(np.int64)
+
+    same_norm = np.fromiter(map(operator.eq, expected_norms, recited_norms), dtype=bool, count=count)
+    same_base = np.fromiter(map(operator.eq, expected_bases, recited_bases), dtype=bool, count=count)
+    lenient = np.trunc(80 * 0.7 + ratio * 0.3).astype(np.int64)
+    return np.where(same_norm, 100, np.where(same_base, lenient, ratio))
+
+def id_similarity(vocab, expected_id, recited_id):
+    """word_similarity of two Vocabulary IDs, cached per ID pair in the vocabulary"""
+    if expected_id == recited_id:
+        return 100
+    key = expected_id << 32 | recited_id
+    score = vocab.pair_cache.get(key)
+    if score is None:
+        score = _word_similarity(vocab.norms[expected_id], vocab.skeletons[expected_id],
+                                 vocab.norms[recited_id], vocab.skeletons[recited_id])
+        vocab.pair_cache.put(key, score)
+    return score
+
+def score_ids(vocab, expected_ids, recited_ids):
+    """score_pairs over two equally long sequences of Vocabulary IDs, as a list.
+
+    Equal IDs score 100 without any lookup; only the differing pairs go
+    through the ID pair cache, and only its misses through the kernel. The
+    sequences are a few words long, so this stays in plain Python.
+    """
+    if isinstance(expected_ids, np.ndarray):
+        expected_ids = expected_ids.tolist()
+    if isinstance(recited_ids, np.ndarray):
+        recited_ids = recited_ids.tolist()
+    scores = [100] * len(expected_ids)
+    differ = [i for i, (e, r) in enumerate(zip(expected_ids, recited_ids)) if e != r]
+    if not differ:
+        return scores
+
+    keys = [expected_ids[i] << 32 | recited_ids[i] for i in differ]
+    cached = vocab.pair_cache.get_many(keys)
+    missing = [k for k, score in enumerate(cached) if score is None]
+    if missing:
+        expected = [expected_ids[differ[k]] for k in missing]
+        recited = [recited_ids[differ[k]] for k in missing]
+        norms, skeletons = vocab.norms, vocab.skeletons
+        computed = _score_pairs([norms[e] for e in expected], [skeletons[e] for e in expected],
+                                [norms[r] for r in recited], [skeletons[r] for r in recited]).tolist()
+        vocab.pair_cache.put_many((keys[k], score) for k, score in zip(missing, computed))
+        for k, score in zip(missing, computed):
+            cached[k] = score
+    for i, score in zip(differ, cached):
+        scores[i] = score
+    return scores
+
+def score_words(expected, recited):
+    """Scores for each aligned (expected, recited) pair of two WordSeq objects"""
+    count = min(len(expected), len(recited))
+    return score_pairs(expected.norm_words[:count], expected.skeleton_words[:count],
+                       recited.norm_words[:count], recited.skeleton_words[:count]).tolist()